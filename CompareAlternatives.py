@@ -3,37 +3,59 @@ import ct_hiv_model_econ_eval.model_classes as model
 import ct_hiv_model_econ_eval.param_classes as param
 import ct_hiv_model_econ_eval.support as support
 
+# the inverse-CDF sampler draws the same transitions as the Gillespie algorithm of deampy,
+# without importing deampy (and so matplotlib) which a headless report does not need
+sampler = model.TransitionSamplers.INVERSE_CDF if data.HEADLESS_REPORT else model.TransitionSamplers.GILLESPIE
+
 # simulating mono therapy
 # create a cohort
 cohort_mono = model.Cohort(id=0,
                            pop_size=data.POP_SIZE,
                            parameters=param.Parameters(therapy=param.Therapies.MONO))
 # simulate the cohort
-cohort_mono.simulate(sim_length=data.SIM_LENGTH)
+cohort_mono.simulate(sim_length=data.SIM_LENGTH, sampler=sampler)
 
 # simulating combination therapy
-# create a cohort
-cohort_combo = model.Cohort(id=1,
+# create a cohort (with common random numbers, the same patients as the mono therapy cohort)
+cohort_combo = model.Cohort(id=0 if data.COMMON_RANDOM_NUMBERS else 1,
                             pop_size=data.POP_SIZE,
                             parameters=param.Parameters(therapy=param.Therapies.COMBO))
 # simulate the cohort
-cohort_combo.simulate(sim_length=data.SIM_LENGTH)
-
-# print the estimates for the mean survival time and mean time to AIDS
-support.print_outcomes(sim_outcomes=cohort_mono.cohortOutcomes,
-                       therapy_name=param.Therapies.MONO)
-support.print_outcomes(sim_outcomes=cohort_combo.cohortOutcomes,
-                       therapy_name=param.Therapies.COMBO)
+cohort_combo.simulate(sim_length=data.SIM_LENGTH, sampler=sampler)
 
-# draw survival curves and histograms
-support.plot_survival_curves_and_histograms(sim_outcomes_mono=cohort_mono.cohortOutcomes,
-                                            sim_outcomes_combo=cohort_combo.cohortOutcomes)
+if data.HEADLESS_REPORT:
+    # export the outcomes, comparative outcomes, CE table, survival curves and histograms as numbers
+    # (no figures are rendered, so matplotlib is never imported)
+    support.export_numeric_report(
+        report=support.get_numeric_report(sim_outcomes_mono=cohort_mono.cohortOutcomes,
+                                          sim_outcomes_combo=cohort_combo.cohortOutcomes,
+                                          if_paired=data.COMMON_RANDOM_NUMBERS),
+        file_name='../Report.json')
+else:
+    # print the estimates for the mean survival time and mean time to AIDS
+    support.print_outcomes(sim_outcomes=cohort_mono.cohortOutcomes,
+                           therapy_name=param.Therapies.MONO)
+    support.print_outcomes(sim_outcomes=cohort_combo.cohortOutcomes,
+                           therapy_name=param.Therapies.COMBO)
 
+    # draw survival curves and histograms
+    support.plot_survival_curves_and_histograms(sim_outcomes_mono=cohort_mono.cohortOutcomes,
+                                                sim_outcomes_combo=cohort_combo.cohortOutcomes)
+    # export the bin counts of the survival time histograms
+    support.export_survival_time_histograms(sim_outcomes_mono=cohort_mono.cohortOutcomes,
+                                            sim_outcomes_combo=cohort_combo.cohortOutcomes,
+                                            file_name='../SurvivalTimeHistograms.csv')
 
-# print comparative outcomes
-support.print_comparative_outcomes(sim_outcomes_mono=cohort_mono.cohortOutcomes,
-                                   sim_outcomes_combo=cohort_combo.cohortOutcomes)
+    # print comparative outcomes
+    support.print_comparative_outcomes(sim_outcomes_mono=cohort_mono.cohortOutcomes,
+                                       sim_outcomes_combo=cohort_combo.cohortOutcomes,
+                                       if_paired=data.COMMON_RANDOM_NUMBERS)
+    # print the incremental outcomes and the ICER with bootstrap intervals
+    support.print_bootstrap_CEA(sim_outcomes_mono=cohort_mono.cohortOutcomes,
+                                sim_outcomes_combo=cohort_combo.cohortOutcomes,
+                                if_paired=data.COMMON_RANDOM_NUMBERS)
 
-# report the CEA results
-support.report_CEA_CBA(sim_outcomes_mono=cohort_mono.cohortOutcomes,
-                       sim_outcomes_combo=cohort_combo.cohortOutcomes)
+    # report the CEA results
+    support.report_CEA_CBA(sim_outcomes_mono=cohort_mono.cohortOutcomes,
+                           sim_outcomes_combo=cohort_combo.cohortOutcomes,
+                           if_paired=data.COMMON_RANDOM_NUMBERS)
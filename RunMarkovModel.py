@@ -1,4 +1,3 @@
-import deampy.plots.histogram as hist
 import deampy.plots.sample_paths as path
 
 import ct_hiv_model_econ_eval.input_data as data
@@ -24,13 +23,8 @@ path.plot_sample_path(
     x_label='Time-Step (Year)',
     y_label='Number Survived')
 
-# plot the histogram of survival times
-hist.plot_histogram(
-    data=myCohort.cohortOutcomes.survivalTimes,
-    title='Histogram of Patient Survival Time',
-    x_label='Survival Time (Year)',
-    y_label='Count',
-    bin_width=1)
+# plot the histogram of survival times (from the bin counts cached on the cohort outcomes)
+support.plot_survival_time_histogram(counts=myCohort.cohortOutcomes.survivalTimeCounts)
 
 # print the outcomes of this simulated cohort
 support.print_outcomes(sim_outcomes=myCohort.cohortOutcomes,
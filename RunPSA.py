@@ -0,0 +1,21 @@
+import ct_hiv_model_econ_eval.input_data as data
+import ct_hiv_model_econ_eval.psa_classes as psa
+import ct_hiv_model_econ_eval.support as support
+
+if __name__ == '__main__':
+
+    # create the probabilistic sensitivity analysis
+    # (rerunning this script resumes from the draws already stored in the results file)
+    PSA = psa.PSA(n_draws=data.PSA_N_DRAWS,
+                  pop_size=data.PSA_POP_SIZE,
+                  file_name='../PSAResults.csv')
+    # simulate the cohorts of all draws
+    PSA.run(sim_length=data.SIM_LENGTH, n_processes=data.PSA_N_PROCESSES)
+
+    # report the cost-effectiveness analysis over the parameter sets
+    support.report_PSA(psa=PSA)
+
+    # probability that each therapy is cost-effective and the expected value of perfect information
+    # over a dense grid of willingness-to-pay values
+    support.report_CEAC_EVPI(mean_costs=PSA.meanCosts, mean_effects=PSA.meanEffects,
+                             file_name='../PSACEACTable.csv')
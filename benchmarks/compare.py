@@ -0,0 +1,35 @@
+"""
+Compares two benchmark results written by benchmarks.run.
+Run from the repository root with: python -m benchmarks.compare base.json new.json
+"""
+import argparse
+import json
+
+
+def load(file_name):
+    """ :return: (dict) commit of the results and the results keyed by benchmark name """
+    with open(file_name) as file:
+        content = json.load(file)
+    return content['commit'], {result['name']: result for result in content['results']}
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare two benchmark results.')
+    parser.add_argument('base', help='json file of the base results')
+    parser.add_argument('new', help='json file of the new results')
+    args = parser.parse_args()
+
+    base_commit, base = load(args.base)
+    new_commit, new = load(args.new)
+
+    print('{:35} {:>12} {:>12} {:>9} {:>12}'.format(
+        'benchmark', str(base_commit) + ' (s)', str(new_commit) + ' (s)', 'speedup', 'memory ratio'))
+    for name, result in new.items():
+        if name not in base:
+            print('{:35} {:>12} {:12.4f}'.format(name, '-', result['seconds']))
+            continue
+        print('{:35} {:12.4f} {:12.4f} {:8.2f}x {:12.2f}'.format(
+            name, base[name]['seconds'], result['seconds'],
+            base[name]['seconds'] / result['seconds'],
+            result['peak_memory_mb'] / base[name]['peak_memory_mb'] if base[name]['peak_memory_mb'] > 0 else float('nan')))
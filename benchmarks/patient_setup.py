@@ -0,0 +1,34 @@
+"""
+Measures the cost of setting up a patient for simulation: constructing the Gillespie algorithm
+for every patient (as Patient.simulate used to) vs. reusing the one cached on the parameters.
+Run from the repository root with: python -m benchmarks.patient_setup
+"""
+import timeit
+
+from deampy.markov import Gillespie
+
+import ct_hiv_model_econ_eval.model_classes as model
+import ct_hiv_model_econ_eval.param_classes as param
+
+N_PATIENTS = 2000   # number of patients to set up
+
+params = param.Parameters(therapy=param.Therapies.COMBO)
+
+
+def set_up_rebuilt():
+    # create patients and a new Gillespie algorithm for each of them
+    for i in range(N_PATIENTS):
+        model.Patient(id=i, parameters=params)
+        Gillespie(transition_rate_matrix=params.compiledModel.rates)
+
+
+def set_up_cached():
+    # create patients and reuse the Gillespie algorithm of the parameters
+    for i in range(N_PATIENTS):
+        model.Patient(id=i, parameters=params)
+        params.compiledModel.get_gillespie()
+
+
+for name, func in (('rebuilt per patient', set_up_rebuilt), ('cached per parameters', set_up_cached)):
+    seconds = min(timeit.repeat(func, number=1, repeat=5))
+    print('Gillespie {}: {:.2f} microseconds per patient'.format(name, 1e6 * seconds / N_PATIENTS))
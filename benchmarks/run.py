@@ -0,0 +1,233 @@
+"""
+Times the simulation hot paths and writes the results to a json file that can be compared between
+commits with benchmarks.compare.
+Run from the repository root with: python -m benchmarks.run --output bench.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+import numpy as np
+
+matplotlib.use('Agg')   # figures of the reporting path are rendered without a display
+
+import ct_hiv_model_econ_eval.input_data as data
+import ct_hiv_model_econ_eval.model_classes as model
+import ct_hiv_model_econ_eval.param_classes as param
+import ct_hiv_model_econ_eval.support as support
+
+MAX_PATIENT_ENGINE_POP_SIZE = 10000     # larger cohorts are only simulated with the batch engine
+
+
+def measure(func, repeat):
+    """ times a function and measures its peak memory
+    :param func: function to call without arguments
+    :param repeat: number of timed calls (the fastest is reported)
+    :return: (dict) seconds of the fastest call and peak memory (MB) allocated during a separate call
+    """
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+
+    # memory is measured in a separate call since tracing allocations slows the function down
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'seconds': min(seconds), 'peak_memory_mb': peak / 2 ** 20}
+
+
+def count_patient_events(params, first_id, n_patients, sim_length, sampler=model.TransitionSamplers.GILLESPIE,
+                         random_streams=model.RandomStreams.LEGACY):
+    """ :return: number of transitions of the patients when simulated by the patient engine """
+
+    n_events = 0
+    for patient_id in range(first_id, first_id + n_patients):
+        patient = model.Patient(id=patient_id, parameters=params, sampler=sampler,
+                                rng=model.get_rng(random_streams=random_streams, cohort_id=0,
+                                                  patient_index=patient_id, patient_id=patient_id))
+        update = patient.stateMonitor.update
+
+        def counting_update(time, new_state):
+            nonlocal n_events
+            n_events += 1
+            update(time=time, new_state=new_state)
+
+        patient.stateMonitor.update = counting_update
+        patient.simulate(sim_length)
+
+    return n_events
+
+
+def bench_parameters(repeat):
+    """ constructing the parameters of each therapy """
+
+    results = []
+    for therapy in param.Therapies:
+        result = measure(lambda: param.Parameters(therapy=therapy), repeat=repeat)
+        result['name'] = 'parameters/{}'.format(therapy.name)
+        results.append(result)
+
+        # the same parameters requested again from the cache
+        result = measure(lambda: param.get_parameters(therapy=therapy), repeat=repeat)
+        result['name'] = 'parameters_cached/{}'.format(therapy.name)
+        results.append(result)
+    return results
+
+
+def bench_patients(n_patients, repeat):
+    """ simulating patients one at a time with each transition sampler and random number streams """
+
+    params = param.Parameters(therapy=param.Therapies.COMBO)
+
+    results = []
+    for sampler, random_streams in ((model.TransitionSamplers.GILLESPIE, model.RandomStreams.LEGACY),
+                                    (model.TransitionSamplers.INVERSE_CDF, model.RandomStreams.LEGACY),
+                                    (model.TransitionSamplers.INVERSE_CDF, model.RandomStreams.GENERATOR)):
+
+        def simulate():
+            for i in range(n_patients):
+                model.Patient(id=i, parameters=params, sampler=sampler,
+                              rng=model.get_rng(random_streams=random_streams, cohort_id=0,
+                                                patient_index=i, patient_id=i)).simulate(data.SIM_LENGTH)
+
+        result = measure(simulate, repeat=repeat)
+        n_events = count_patient_events(params=params, first_id=0, n_patients=n_patients,
+                                        sim_length=data.SIM_LENGTH, sampler=sampler, random_streams=random_streams)
+        # the defaults keep the name used before samplers and streams could be selected
+        if sampler == model.TransitionSamplers.GILLESPIE:
+            name = 'patient/{}'.format(n_patients)
+        elif random_streams == model.RandomStreams.LEGACY:
+            name = 'patient/{}/{}'.format(sampler.name, n_patients)
+        else:
+            name = 'patient/{}/{}/{}'.format(sampler.name, random_streams.name, n_patients)
+        result.update(name=name, events=n_events, events_per_sec=n_events / result['seconds'])
+        results.append(result)
+    return results
+
+
+def bench_cohorts(pop_sizes, repeat):
+    """ simulating a cohort with each engine at several population sizes """
+
+    params = param.Parameters(therapy=param.Therapies.COMBO)
+
+    results = []
+    for engine in model.SimulationEngines:
+        for pop_size in pop_sizes:
+            # the patient engine is too slow for the largest cohorts
+            if engine == model.SimulationEngines.PATIENT and pop_size > MAX_PATIENT_ENGINE_POP_SIZE:
+                continue
+
+            def simulate():
+                model.Cohort(id=1, pop_size=pop_size, parameters=params).simulate(
+                    sim_length=data.SIM_LENGTH, engine=engine)
+
+            result = measure(simulate, repeat=repeat)
+            result.update(name='cohort/{}/{}'.format(engine.name, pop_size),
+                          patients_per_sec=pop_size / result['seconds'])
+            if engine == model.SimulationEngines.PATIENT:
+                n_events = count_patient_events(params=params, first_id=pop_size, n_patients=pop_size,
+                                                sim_length=data.SIM_LENGTH)
+                result.update(events=n_events, events_per_sec=n_events / result['seconds'])
+            else:
+                # each step draws one event for every patient still running
+                cohort = model.Cohort(id=1, pop_size=pop_size, parameters=params)
+                cohort.simulate(sim_length=data.SIM_LENGTH, engine=engine)
+                n_events = int(cohort.activeSetSizes.sum())
+                result.update(events=n_events, events_per_sec=n_events / result['seconds'],
+                              steps=len(cohort.activeSetSizes), active_set_sizes=cohort.activeSetSizes.tolist())
+            results.append(result)
+    return results
+
+
+def bench_reporting(pop_size, repeat):
+    """ comparative outcomes and cost-effectiveness reporting for two simulated cohorts """
+
+    outcomes = []
+    for cohort_id, therapy in enumerate(param.Therapies):
+        cohort = model.Cohort(id=cohort_id, pop_size=pop_size, parameters=param.Parameters(therapy=therapy))
+        cohort.simulate(sim_length=data.SIM_LENGTH, engine=model.SimulationEngines.BATCH)
+        outcomes.append(cohort.cohortOutcomes)
+
+    def report():
+        support.print_comparative_outcomes(sim_outcomes_mono=outcomes[0], sim_outcomes_combo=outcomes[1])
+        support.report_CEA_CBA(sim_outcomes_mono=outcomes[0], sim_outcomes_combo=outcomes[1])
+
+    # reports are written relative to the working directory, so run them in a temporary one
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.makedirs(os.path.join(folder, 'work', 'figs'))
+        os.chdir(os.path.join(folder, 'work'))
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                result = measure(report, repeat=repeat)
+        finally:
+            os.chdir(cwd)
+
+    result['name'] = 'report_CEA_CBA/{}'.format(pop_size)
+    return [result]
+
+
+def bench_bootstrap(pop_size, n_replicates, repeat):
+    """ bootstrapping the incremental outcomes of two simulated cohorts """
+
+    import ct_hiv_model_econ_eval.bootstrap_classes as bootstrap
+
+    outcomes = []
+    for cohort_id, therapy in enumerate(param.Therapies):
+        cohort = model.Cohort(id=cohort_id, pop_size=pop_size, parameters=param.Parameters(therapy=therapy))
+        cohort.simulate(sim_length=data.SIM_LENGTH, engine=model.SimulationEngines.BATCH)
+        outcomes.append(cohort.cohortOutcomes)
+
+    result = measure(lambda: bootstrap.get_bootstrap_cea(sim_outcomes_base=outcomes[0], sim_outcomes_new=outcomes[1],
+                                                         n_replicates=n_replicates), repeat=repeat)
+    result.update(name='bootstrap_cea/{}/{}'.format(pop_size, n_replicates),
+                  replicates_per_sec=n_replicates / result['seconds'])
+    return [result]
+
+
+def get_commit():
+    """ :return: the current git commit (None if not available) """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark the simulation hot paths.')
+    parser.add_argument('--output', default='bench.json', help='json file to write the results to')
+    parser.add_argument('--pop-sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='population sizes of the simulated cohorts')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed calls of each benchmark')
+    args = parser.parse_args()
+
+    results = []
+    results += bench_parameters(repeat=args.repeat)
+    results += bench_patients(n_patients=1000, repeat=args.repeat)
+    results += bench_cohorts(pop_sizes=args.pop_sizes, repeat=args.repeat)
+    results += bench_reporting(pop_size=data.POP_SIZE, repeat=args.repeat)
+    results += bench_bootstrap(pop_size=data.POP_SIZE, n_replicates=10000, repeat=args.repeat)
+
+    for result in results:
+        print('{:35} {:10.4f} s {:10.1f} MB'.format(result['name'], result['seconds'], result['peak_memory_mb']),
+              '  {:,.0f} events/s'.format(result['events_per_sec']) if 'events_per_sec' in result else '')
+
+    with open(args.output, 'w') as file:
+        json.dump({'commit': get_commit(),
+                   'python': platform.python_version(),
+                   'numpy': np.__version__,
+                   'results': results}, file, indent=2)
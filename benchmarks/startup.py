@@ -0,0 +1,88 @@
+"""
+Measures how long a new (e.g. worker) process takes to import the model, and which heavy
+dependencies get imported along the way. Each case runs in a fresh interpreter.
+Run from the repository root with: python -m benchmarks.startup
+"""
+import json
+import subprocess
+import sys
+
+REPEAT = 5      # number of fresh interpreters per case (the fastest is reported)
+
+# code run by each case after the interpreter has started
+CASES = [
+    ('import param_classes', 'import ct_hiv_model_econ_eval.param_classes'),
+    ('import model_classes', 'import ct_hiv_model_econ_eval.model_classes'),
+    ('import model_classes, param_classes',
+     'import ct_hiv_model_econ_eval.model_classes\n'
+     'import ct_hiv_model_econ_eval.param_classes'),
+    ('parameters of both therapies',
+     'import ct_hiv_model_econ_eval.param_classes as param\n'
+     'for therapy in param.Therapies:\n'
+     '    param.Parameters(therapy=therapy)'),
+    ('batch cohort',
+     'import ct_hiv_model_econ_eval.model_classes as model\n'
+     'import ct_hiv_model_econ_eval.param_classes as param\n'
+     'cohort = model.Cohort(id=0, pop_size=1000, parameters=param.Parameters(therapy=param.Therapies.COMBO))\n'
+     'cohort.simulate(sim_length=1000, engine=model.SimulationEngines.BATCH)'),
+    ('batch cohorts and numeric report',
+     'import ct_hiv_model_econ_eval.model_classes as model\n'
+     'import ct_hiv_model_econ_eval.param_classes as param\n'
+     'import ct_hiv_model_econ_eval.support as support\n'
+     'outcomes = []\n'
+     'for cohort_id, therapy in enumerate(param.Therapies):\n'
+     '    cohort = model.Cohort(id=cohort_id, pop_size=1000, parameters=param.Parameters(therapy=therapy))\n'
+     '    cohort.simulate(sim_length=1000, engine=model.SimulationEngines.BATCH)\n'
+     '    outcomes.append(cohort.cohortOutcomes)\n'
+     'support.get_numeric_report(sim_outcomes_mono=outcomes[0], sim_outcomes_combo=outcomes[1])'),
+    ('streaming cohort',
+     'import ct_hiv_model_econ_eval.model_classes as model\n'
+     'import ct_hiv_model_econ_eval.param_classes as param\n'
+     'cohort = model.Cohort(id=0, pop_size=1000, parameters=param.Parameters(therapy=param.Therapies.COMBO),\n'
+     '                      if_streaming=True)\n'
+     'cohort.simulate(sim_length=1000, engine=model.SimulationEngines.BATCH)'),
+    ('PSA draw (as run by a worker process)',
+     'import ct_hiv_model_econ_eval.psa_classes as psa\n'
+     'analysis = psa.PSA(n_draws=1, pop_size=100, file_name=None)\n'
+     'analysis.run(sim_length=1000)'),
+    ('expected state occupancy',
+     'import ct_hiv_model_econ_eval.model_classes as model\n'
+     'import ct_hiv_model_econ_eval.param_classes as param\n'
+     'occupancy = model.CohortOccupancy(pop_size=1000, parameters=param.Parameters(therapy=param.Therapies.COMBO))\n'
+     'occupancy.evaluate(times=range(101))'),
+    ('import support', 'import ct_hiv_model_econ_eval.support'),
+    ('import deampy (reference)', 'import deampy'),
+]
+
+# heavy dependencies to report on
+MODULES = ['matplotlib', 'deampy', 'scipy']
+
+# measures the case in the new interpreter and prints the results as json
+TEMPLATE = '''
+import json, sys, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'imported': [m for m in {modules} if m in sys.modules]}}))
+'''
+
+
+def run_case(code):
+    """
+    :param code: (string) code to time in a fresh interpreter
+    :return: (dict) seconds of the fastest run and the heavy dependencies it imported
+    """
+
+    results = []
+    for _ in range(REPEAT):
+        output = subprocess.run([sys.executable, '-c', TEMPLATE.format(code=code, modules=MODULES)],
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+    return min(results, key=lambda result: result['seconds'])
+
+
+if __name__ == '__main__':
+
+    for name, code in CASES:
+        result = run_case(code=code)
+        print('{:45} {:8.3f} s   imports: {}'.format(name, result['seconds'], ', '.join(result['imported']) or '-'))
@@ -0,0 +1,77 @@
+import csv
+
+import numpy as np
+
+import ct_hiv_model_econ_eval.input_data as data
+
+
+def get_wtp_values(wtp_range=data.WTP_RANGE, n_values=data.N_WTP_VALUES):
+    """
+    :param wtp_range: (list) minimum and maximum willingness-to-pay values
+    :param n_values: number of willingness-to-pay values
+    :return: (np.array) evenly spaced willingness-to-pay values within the range
+    """
+    return np.linspace(wtp_range[0], wtp_range[1], n_values)
+
+
+class AcceptabilityAnalysis:
+    def __init__(self, mean_costs, mean_effects, wtp_values=None, strategy_names=None):
+        """ cost-effectiveness acceptability curves and the expected value of perfect information
+        of strategies evaluated over a set of parameter draws (PSA) or bootstrap replicates
+        :param mean_costs: (np.array) mean cost of each strategy (columns) in each draw (rows)
+        :param mean_effects: (np.array) mean effect of each strategy (columns) in each draw (rows)
+        :param wtp_values: (np.array) willingness-to-pay values per unit of effect
+                           (if None, N_WTP_VALUES values within WTP_RANGE)
+        :param strategy_names: (list) names of the strategies (used in the exported table)
+        """
+
+        mean_costs = np.asarray(mean_costs, dtype=float)
+        mean_effects = np.asarray(mean_effects, dtype=float)
+        if mean_costs.shape != mean_effects.shape:
+            raise ValueError('Mean costs and mean effects should have the same shape.')
+
+        # draws with the outcomes of all strategies (e.g. draws of a PSA that is still running are nan)
+        if_complete = ~np.isnan(mean_costs).any(axis=1) & ~np.isnan(mean_effects).any(axis=1)
+        mean_costs = mean_costs[if_complete]
+        mean_effects = mean_effects[if_complete]
+
+        n_strategies = mean_costs.shape[1]
+        self.wtpValues = get_wtp_values() if wtp_values is None else np.asarray(wtp_values, dtype=float)
+        self.strategyNames = strategy_names if strategy_names is not None \
+            else ['Strategy {}'.format(i) for i in range(n_strategies)]
+        self.nDraws = mean_costs.shape[0]
+
+        # net monetary benefit of each draw (axis 0) and strategy (axis 1) at each willingness-to-pay value (axis 2)
+        nmbs = np.multiply.outer(mean_effects, self.wtpValues) - mean_costs[:, :, np.newaxis]
+
+        # probability that each strategy (rows) has the highest net monetary benefit at each
+        # willingness-to-pay value (columns)
+        optimal_in_draws = nmbs.argmax(axis=1)
+        self.probCostEffective = (optimal_in_draws == np.arange(n_strategies)[:, np.newaxis, np.newaxis]).mean(axis=1)
+
+        # expected net monetary benefit of each strategy (rows) at each willingness-to-pay value (columns)
+        self.expectedNMBs = nmbs.mean(axis=0)
+        # strategy with the highest expected net monetary benefit at each willingness-to-pay value
+        self.optimalStrategies = self.expectedNMBs.argmax(axis=0)
+
+        # expected value of perfect information at each willingness-to-pay value: the expected net monetary
+        # benefit of choosing the best strategy in each draw minus that of choosing the best strategy overall
+        self.EVPI = nmbs.max(axis=1).mean(axis=0) - self.expectedNMBs.max(axis=0)
+
+    def export_table(self, file_name):
+        """ writes the probability of being cost-effective and the expected net monetary benefit of
+        each strategy, and the expected value of perfect information, at each willingness-to-pay value
+        :param file_name: (string) csv file to write
+        """
+
+        with open(file_name, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['WTP']
+                            + ['Prob Cost-Effective {}'.format(name) for name in self.strategyNames]
+                            + ['Expected NMB {}'.format(name) for name in self.strategyNames]
+                            + ['Optimal Strategy', 'EVPI'])
+            for i, wtp in enumerate(self.wtpValues):
+                writer.writerow([wtp]
+                                + list(self.probCostEffective[:, i])
+                                + list(self.expectedNMBs[:, i])
+                                + [self.strategyNames[self.optimalStrategies[i]], self.EVPI[i]])
@@ -0,0 +1,186 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import ct_hiv_model_econ_eval.input_data as data
+
+
+def get_block_size(n_patients, chunk_size=data.BOOTSTRAP_CHUNK_SIZE):
+    """
+    :param n_patients: number of resampled patients
+    :param chunk_size: maximum number of resampled patients held in memory at once
+    :return: number of bootstrap replicates resampled together with one index matrix
+    """
+    return max(1, chunk_size // n_patients)
+
+
+def resample_means(outcomes, seed, stream, first_replicate, n_replicates, block_size):
+    """ means of the patients' outcomes over bootstrap samples of the patients
+    (each block of replicates has its own random stream, so the means do not depend on how the
+    replicates are split between processes)
+    :param outcomes: (np.array) outcomes (columns) of each patient (rows)
+    :param seed: seed of the bootstrap
+    :param stream: index of this group of patients (groups are resampled independently)
+    :param first_replicate: index of the first replicate (a multiple of block_size)
+    :param n_replicates: number of replicates
+    :param block_size: number of replicates resampled together with one index matrix
+    :return: (np.array) mean outcomes (columns) of each replicate (rows)
+    """
+
+    n_patients = outcomes.shape[0]
+    means = np.empty((n_replicates, outcomes.shape[1]))
+
+    for start in range(0, n_replicates, block_size):
+        block = (first_replicate + start) // block_size
+        rng = np.random.Generator(np.random.PCG64(np.random.SeedSequence(entropy=seed, spawn_key=(stream, block))))
+        n = min(block_size, n_replicates - start)
+
+        # (n x N) index matrix of the resampled patients, offset so that the patients of each
+        # replicate are counted in their own row
+        indices = rng.integers(0, n_patients, size=(n, n_patients))
+        indices += np.arange(0, n * n_patients, n_patients)[:, np.newaxis]
+        # how many times each patient is resampled in each replicate
+        counts = np.bincount(indices.ravel(), minlength=n * n_patients).reshape(n, n_patients)
+
+        means[start:start + n] = counts @ outcomes / n_patients
+
+    return means
+
+
+def get_percentile_interval(values, alpha=data.ALPHA):
+    """
+    :param values: (np.array) values of each bootstrap replicate (rows)
+    :param alpha: significance level
+    :return: (np.array) lower and upper bounds (rows) of the percentile interval
+    """
+    return np.percentile(values, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+
+
+class BootstrapCEA:
+    def __init__(self, costs_base, effects_base, costs_new, effects_new, if_paired=False):
+        """ compares a new strategy to a base strategy, with the uncertainty of the incremental
+        outcomes characterized by bootstrapping the patients of both cohorts
+        :param costs_base: (np.array) discounted cost of each patient under the base strategy
+        :param effects_base: (np.array) discounted utility of each patient under the base strategy
+        :param costs_new: (np.array) discounted cost of each patient under the new strategy
+        :param effects_new: (np.array) discounted utility of each patient under the new strategy
+        :param if_paired: set to True if both cohorts are the same patients simulated with common random numbers
+                          (the patients are then resampled together)
+        """
+
+        if if_paired and len(costs_base) != len(costs_new):
+            raise ValueError('Paired cohorts should have the same number of patients.')
+
+        self.ifPaired = if_paired
+
+        # outcomes of each group of patients that is resampled together
+        # (columns are the cost and effect under the base strategy followed by those under the new strategy)
+        if if_paired:
+            self._outcomes = [np.column_stack((costs_base, effects_base, costs_new, effects_new))]
+        else:
+            self._outcomes = [np.column_stack((costs_base, effects_base)), np.column_stack((costs_new, effects_new))]
+
+        self.meanCosts = None       # mean cost of each strategy (columns) in each bootstrap replicate (rows)
+        self.meanEffects = None     # mean effect of each strategy (columns) in each bootstrap replicate (rows)
+
+    def resample(self, n_replicates=data.N_BOOTSTRAP_SAMPLES, seed=0, n_processes=1,
+                 chunk_size=data.BOOTSTRAP_CHUNK_SIZE):
+        """ calculates the mean outcomes of both strategies in each bootstrap replicate
+        :param n_replicates: number of bootstrap replicates
+        :param seed: seed of the bootstrap
+        :param n_processes: number of worker processes
+        :param chunk_size: maximum number of resampled patients held in memory at once (in each process)
+        """
+
+        means = []
+        for stream, outcomes in enumerate(self._outcomes):
+            block_size = get_block_size(n_patients=outcomes.shape[0], chunk_size=chunk_size)
+
+            if n_processes == 1:
+                means.append(resample_means(outcomes=outcomes, seed=seed, stream=stream, first_replicate=0,
+                                            n_replicates=n_replicates, block_size=block_size))
+            else:
+                # split the blocks of replicates into contiguous shards, one per process
+                n_blocks = -(-n_replicates // block_size)
+                shard_first_blocks = [shard[0] for shard in np.array_split(range(n_blocks), n_processes)
+                                      if len(shard) > 0]
+                shard_first_replicates = [int(block) * block_size for block in shard_first_blocks] + [n_replicates]
+
+                with ProcessPoolExecutor(max_workers=n_processes) as executor:
+                    futures = [executor.submit(resample_means,
+                                               outcomes=outcomes,
+                                               seed=seed,
+                                               stream=stream,
+                                               first_replicate=first,
+                                               n_replicates=last - first,
+                                               block_size=block_size)
+                               for first, last in zip(shard_first_replicates[:-1], shard_first_replicates[1:])]
+                    means.append(np.vstack([future.result() for future in futures]))
+
+        means = np.hstack(means)
+        self.meanCosts = means[:, [0, 2]]
+        self.meanEffects = means[:, [1, 3]]
+
+    def get_incremental_costs(self):
+        """ :return: (np.array) incremental cost of the new strategy in each bootstrap replicate """
+        return self.meanCosts[:, 1] - self.meanCosts[:, 0]
+
+    def get_incremental_effects(self):
+        """ :return: (np.array) incremental effect of the new strategy in each bootstrap replicate """
+        return self.meanEffects[:, 1] - self.meanEffects[:, 0]
+
+    def get_icers(self):
+        """ :return: (np.array) ICER of the new strategy in each bootstrap replicate
+        (infinite if the replicate has no incremental effect) """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.get_incremental_costs() / self.get_incremental_effects()
+
+    def get_incremental_nmbs(self, wtp_values):
+        """
+        :param wtp_values: (np.array) willingness-to-pay values per unit of effect
+        :return: (np.array) incremental net monetary benefit of the new strategy in each bootstrap
+                 replicate (rows) at each willingness-to-pay value (columns)
+        """
+        return np.multiply.outer(self.get_incremental_effects(), wtp_values) - self.get_incremental_costs()[:, np.newaxis]
+
+    def get_incremental_cost_interval(self, alpha=data.ALPHA):
+        """ :return: (np.array) percentile interval of the incremental cost """
+        return get_percentile_interval(values=self.get_incremental_costs(), alpha=alpha)
+
+    def get_incremental_effect_interval(self, alpha=data.ALPHA):
+        """ :return: (np.array) percentile interval of the incremental effect """
+        return get_percentile_interval(values=self.get_incremental_effects(), alpha=alpha)
+
+    def get_icer_interval(self, alpha=data.ALPHA):
+        """ :return: (np.array) percentile interval of the ICER """
+        return get_percentile_interval(values=self.get_icers(), alpha=alpha)
+
+    def get_incremental_nmb_intervals(self, wtp_values, alpha=data.ALPHA):
+        """
+        :param wtp_values: (np.array) willingness-to-pay values per unit of effect
+        :param alpha: significance level
+        :return: (np.array) lower and upper bounds (columns) of the percentile interval of the
+                 incremental net monetary benefit at each willingness-to-pay value (rows)
+        """
+        return get_percentile_interval(values=self.get_incremental_nmbs(wtp_values=wtp_values), alpha=alpha).T
+
+
+def get_bootstrap_cea(sim_outcomes_base, sim_outcomes_new, if_paired=False, n_replicates=data.N_BOOTSTRAP_SAMPLES,
+                      seed=0, n_processes=1):
+    """
+    :param sim_outcomes_base: (CohortOutcomes) outcomes of the cohort simulated under the base strategy
+    :param sim_outcomes_new: (CohortOutcomes) outcomes of the cohort simulated under the new strategy
+    :param if_paired: set to True if both cohorts are the same patients simulated with common random numbers
+    :param n_replicates: number of bootstrap replicates
+    :param seed: seed of the bootstrap
+    :param n_processes: number of worker processes
+    :return: (BootstrapCEA) the resampled comparison of both strategies
+    """
+
+    bootstrap = BootstrapCEA(costs_base=sim_outcomes_base.costs,
+                             effects_base=sim_outcomes_base.utilities,
+                             costs_new=sim_outcomes_new.costs,
+                             effects_new=sim_outcomes_new.utilities,
+                             if_paired=if_paired)
+    bootstrap.resample(n_replicates=n_replicates, seed=seed, n_processes=n_processes)
+    return bootstrap
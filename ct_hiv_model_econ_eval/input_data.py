@@ -5,6 +5,16 @@ POP_SIZE = 2000     # cohort population size
 SIM_LENGTH = 1000   # length of simulation (years)
 ALPHA = 0.05        # significance level for calculating confidence intervals
 DISCOUNT = 0.03     # annual discount rate
+COMMON_RANDOM_NUMBERS = False   # set to True to simulate both therapies with the same patients (paired comparison)
+HEADLESS_REPORT = False         # set to True to only export the reported numbers (no figures, no matplotlib)
+PARAMETERS_CACHE_SIZE = 128     # maximum number of parameter sets kept by param_classes.get_parameters
+SAMPLER_BLOCK_SIZE = 8          # transitions whose random numbers the inverse-CDF sampler draws at once
+WTP_RANGE = [0, 50000]          # range of willingness-to-pay values per QALY ($)
+N_WTP_VALUES = 201              # number of willingness-to-pay values evaluated within WTP_RANGE
+N_BOOTSTRAP_SAMPLES = 1000      # number of bootstrap replicates for the intervals of incremental outcomes
+BOOTSTRAP_CHUNK_SIZE = 2 ** 22  # maximum number of resampled patients held in memory at once
+HISTOGRAM_BIN_WIDTH = 1         # width (years) of the bins of survival time histograms
+SURVIVAL_CURVE_MAX_POINTS = 10000   # maximum number of points of survival curves (larger cohorts are downsampled)
 # annual probability of background mortality (number per year per 1,000 population)
 ANNUAL_PROB_BACKGROUND_MORT = 8.15 / 1000
 
@@ -47,6 +57,15 @@ Lamivudine_COST = 2086.0
 
 # treatment relative risk
 TREATMENT_RR = 0.509
+# 95% confidence interval of the treatment relative risk
+TREATMENT_RR_CI = [0.365, 0.710]
+
+# probabilistic sensitivity analysis settings
+PSA_N_DRAWS = 1000          # number of parameter sets to sample
+PSA_POP_SIZE = 2000         # cohort population size for each parameter set
+PSA_N_PROCESSES = 4         # number of worker processes
+PSA_COST_CV = 0.25          # coefficient of variation of the annual state costs
+PSA_UTILITY_CV = 0.1        # coefficient of variation of the annual state utilities
 
 
 
@@ -1,40 +1,134 @@
-import deampy.econ_eval as econ
-import deampy.statistics as stats
+import math
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+
 import numpy as np
-from deampy.markov import Gillespie
-from deampy.plots.sample_paths import PrevalencePathBatchUpdate
 
+import ct_hiv_model_econ_eval.input_data as data
 from ct_hiv_model_econ_eval.input_data import HealthStates
+from ct_hiv_model_econ_eval.stat_classes import OnePassStat
+from ct_hiv_model_econ_eval.survival_classes import SurvivalCurve
+from ct_hiv_model_econ_eval.trajectory_classes import TrajectoryLog
+
+
+class TransitionSamplers(Enum):
+    """ algorithms to sample the next transition of a patient """
+    GILLESPIE = 0       # deampy's Gillespie algorithm (exponential and empirical distributions)
+    INVERSE_CDF = 1     # inverse CDFs on the precomputed tables of the compiled model (see InverseCDFSampler)
+
+
+class RandomStreams(Enum):
+    """ how the random number streams of patients are created """
+    LEGACY = 0      # np.random.RandomState seeded by the patient id (or cohort id), as in earlier versions
+    GENERATOR = 1   # np.random.Generator (PCG64) on a child of the SeedSequence of the cohort id
+
+
+def get_rng(random_streams, cohort_id, patient_index=None, patient_id=None):
+    """
+    :param random_streams: (RandomStreams) how random number streams are created
+    :param cohort_id: id of the cohort
+    :param patient_index: index of the patient in the cohort (None for the stream of the whole cohort)
+    :param patient_id: id of the patient (used to seed legacy patient streams)
+    :return: random number generator of the patient (or of the cohort)
+    """
+
+    if random_streams == RandomStreams.LEGACY:
+        return np.random.RandomState(seed=cohort_id if patient_index is None else patient_id)
+
+    elif random_streams == RandomStreams.GENERATOR:
+        if patient_index is None:
+            seed_sequence = np.random.SeedSequence(entropy=cohort_id)
+        else:
+            # the same child as SeedSequence(entropy=cohort_id).spawn(pop_size)[patient_index],
+            # created without spawning the children of the patients before it
+            seed_sequence = np.random.SeedSequence(entropy=cohort_id, spawn_key=(patient_index,))
+        return np.random.Generator(np.random.PCG64(seed_sequence))
+
+    else:
+        raise ValueError('Invalid random streams: {}.'.format(random_streams))
+
+
+class InverseCDFSampler:
+    def __init__(self, compiled_model, rng, block_size=data.SAMPLER_BLOCK_SIZE):
+        """ samples the transitions of a patient by inverting the CDFs of the sojourn time and of the
+        destination, using random numbers drawn from the patient's generator in blocks
+        (the k-th transition always uses the (2k)-th and (2k+1)-th random numbers)
+        :param compiled_model: (CompiledModel) exit rates and cumulative jump probabilities of each state
+        :param rng: random number generator of the patient
+        :param block_size: number of transitions to draw random numbers for at once
+        """
+        self.rng = rng
+        self.blockSize = block_size
+
+        # tables as Python lists, which are faster than arrays to index one element at a time
+        self._exitRates = compiled_model.exitRates.tolist()
+        self._cumJumpProbs = compiled_model.cumJumpProbs.tolist()
+
+        self._uniforms = []     # random numbers drawn but not yet used
+        self._i = 0             # index of the next random number to use
+
+    def get_next_state(self, current_state_index):
+        """
+        :param current_state_index: index of the current state
+        :return: (dt, i) where dt is the time until the next event and i is the index of the next state
+                 (dt is None if the current state is absorbing)
+        """
+
+        exit_rate = self._exitRates[current_state_index]
+        if exit_rate == 0:
+            return None, current_state_index
+
+        # draw the random numbers of the next block of transitions
+        if self._i == len(self._uniforms):
+            self._uniforms = self.rng.random(2 * self.blockSize).tolist()
+            self._i = 0
+
+        u_time, u_state = self._uniforms[self._i], self._uniforms[self._i + 1]
+        self._i += 2
+
+        # exponential sojourn time and the first state whose cumulative jump probability exceeds u_state
+        return -math.log(1 - u_time) / exit_rate, bisect_right(self._cumJumpProbs[current_state_index], u_state)
 
 
 class Patient:
-    def __init__(self, id, parameters):
+    def __init__(self, id, parameters, trajectory_log=None, sampler=TransitionSamplers.GILLESPIE, rng=None):
         """ initiates a patient
         :param id: ID of the patient
         :param parameters: an instance of the parameters class
+        :param trajectory_log: (TrajectoryLog) to record the transitions of this patient in (optional)
+        :param sampler: (TransitionSamplers) algorithm to sample the transitions of this patient with
+        :param rng: random number generator of this patient (if None, np.random.RandomState seeded by the id)
         """
         self.id = id
         self.params = parameters
         self.stateMonitor = PatientStateMonitor(parameters=parameters)  # patient state monitor
+        self.trajectoryLog = trajectory_log
+        self.sampler = sampler
+        self.rng = rng
 
     def simulate(self, sim_length):
         """ simulate the patient over the specified simulation length """
 
         # random number generator for this patient
-        rng = np.random.RandomState(seed=self.id)
-        # gillespie algorithm
-        gillespie = Gillespie(transition_rate_matrix=self.params.transRateMatrix)
+        rng = self.rng if self.rng is not None else np.random.RandomState(seed=self.id)
+        if self.sampler == TransitionSamplers.INVERSE_CDF:
+            get_next_state = InverseCDFSampler(compiled_model=self.params.compiledModel, rng=rng).get_next_state
+        else:
+            # gillespie algorithm (shared by all patients simulated with these parameters)
+            gillespie = self.params.compiledModel.get_gillespie()
+
+            def get_next_state(current_state_index):
+                return gillespie.get_next_state(current_state_index=current_state_index, rng=rng)
 
         t = 0  # simulation time
         if_stop = False
 
         while not if_stop:
             # find time until next event (dt), and next state
-            # (note that the gillespie algorithm returns None for dt if the process
+            # (note that the samplers return None for dt if the process
             # is in an absorbing state)
-            dt, new_state_index = gillespie.get_next_state(
-                current_state_index=self.stateMonitor.currentState.value,
-                rng=rng)
+            dt, new_state_index = get_next_state(current_state_index=self.stateMonitor.currentState.value)
 
             # stop if time to next event (dt) is None (i.e. we have reached an absorbing state)
             if dt is None:
@@ -51,6 +145,11 @@ class Patient:
                 else:
                     # advance time to the time of next event
                     t += dt
+                # record the transition
+                if self.trajectoryLog is not None:
+                    self.trajectoryLog.record(patient_id=self.id, time=t,
+                                              from_state=self.stateMonitor.currentState,
+                                              to_state=HealthStates(new_state_index))
                 # update health state
                 self.stateMonitor.update(time=t, new_state=HealthStates(new_state_index))
 
@@ -93,6 +192,7 @@ class PatientCostUtilityMonitor:
     def __init__(self, parameters):
 
         self.tLastRecorded = 0  # time when the last cost and outcomes got recorded
+        self.discountLastRecorded = 1   # continuous discount factor (exp(-rate * time)) at the last recording
 
         # model parameters for this patient
         self.params = parameters
@@ -111,13 +211,19 @@ class PatientCostUtilityMonitor:
         cost = self.params.annualStateCosts[current_state.value] + self.params.annualTreatmentCost
         utility = self.params.annualStateUtilities[current_state.value]
 
-        # discounted cost and utility (continuously compounded)
-        discounted_cost = econ.pv_continuous_payment(payment=cost,
-                                                     discount_rate=self.params.discountRate,
-                                                     discount_period=(self.tLastRecorded, time))
-        discounted_utility = econ.pv_continuous_payment(payment=utility,
-                                                        discount_rate=self.params.discountRate,
-                                                        discount_period=(self.tLastRecorded, time))
+        # discounted cost and utility (continuously compounded); both payments share the change in the
+        # discount factor over the period, and the factor at its start is kept from the last recording
+        # (this gives the same values as econ.pv_continuous_payment)
+        discount_rate = self.params.discountRate
+        if discount_rate == 0:
+            discounted_cost = cost * (time - self.tLastRecorded)
+            discounted_utility = utility * (time - self.tLastRecorded)
+        else:
+            discount_now = np.exp(-discount_rate * time)
+            discount_change = self.discountLastRecorded - discount_now
+            discounted_cost = cost / discount_rate * discount_change
+            discounted_utility = utility / discount_rate * discount_change
+            self.discountLastRecorded = discount_now
 
         # update total discounted cost and utility
         self.totalDiscountedCost += discounted_cost
@@ -127,81 +233,695 @@ class PatientCostUtilityMonitor:
         self.tLastRecorded = time
 
 
+def get_discount_factors(discount_rate, starts, ends):
+    """ present values of continuous payments of 1 per unit of time received over many periods
+    :param discount_rate: discount rate (continuously compounded)
+    :param starts: (np.array) start of each period
+    :param ends: (np.array) end of each period
+    :return: (np.array) (exp(-discount_rate*starts) - exp(-discount_rate*ends)) / discount_rate
+    """
+
+    if discount_rate == 0:
+        return ends - starts
+    else:
+        return (np.exp(-discount_rate * starts) - np.exp(-discount_rate * ends)) / discount_rate
+
+
+def get_bin_counts(obs, bin_width):
+    """
+    :param obs: (np.array) non-negative observations
+    :param bin_width: width of the bins
+    :return: (np.array) number of observations in each bin (the k-th bin is [k * bin_width, (k + 1) * bin_width))
+    """
+    return np.bincount((np.asarray(obs) // bin_width).astype(int))
+
+
+def add_bin_counts(counts, other_counts):
+    """ adds the bin counts of two sets of observations (e.g. survival time histograms exported by separate runs)
+    :param counts: (np.array) number of observations in each bin
+    :param other_counts: (np.array) number of other observations in each bin (of the same width)
+    :return: (np.array) number of all observations in each bin
+    """
+
+    if len(counts) < len(other_counts):
+        counts, other_counts = other_counts, counts
+    total = np.array(counts)
+    total[:len(other_counts)] += other_counts
+    return total
+
+
+class SimulationEngines(Enum):
+    """ engines to simulate a cohort of patients """
+    PATIENT = 0     # one Patient object per individual, each with its own Gillespie loop
+    BATCH = 1       # all patients of the cohort advanced together with NumPy arrays
+
+
 class Cohort:
-    def __init__(self, id, pop_size, parameters):
+    def __init__(self, id, pop_size, parameters, if_streaming=False, if_record_trajectories=False):
         """ create a cohort of patients
         :param id: cohort ID
         :param pop_size: population size of this cohort
         :param parameters: parameters
+        :param if_streaming: set to True to only keep summary statistics of patient outcomes
+                             (see CohortOutcomes)
+        :param if_record_trajectories: set to True to record the transitions of all patients
+                                       (see CohortOutcomes)
         """
         self.id = id
         self.popSize = pop_size
         self.params = parameters
-        self.cohortOutcomes = CohortOutcomes()  # outcomes of this simulated cohort
-
-    def simulate(self, sim_length):
+        self.ifStreaming = if_streaming
+        self.ifRecordTrajectories = if_record_trajectories
+        # number of patients still running at each step of the batch engine (instrumentation)
+        self.activeSetSizes = None
+        # outcomes of this simulated cohort
+        self.cohortOutcomes = CohortOutcomes(pop_size=pop_size,
+                                             if_streaming=if_streaming,
+                                             if_record_trajectories=if_record_trajectories)
+
+    def simulate(self, sim_length, engine=SimulationEngines.PATIENT, n_processes=1, if_synchronized=False,
+                 sampler=TransitionSamplers.GILLESPIE, random_streams=RandomStreams.LEGACY):
         """ simulate the cohort of patients over the specified number of time-steps
         :param sim_length: simulation length
+        :param engine: (SimulationEngines) the engine to simulate the cohort with
+        :param n_processes: number of worker processes to simulate patients in
+                            (only supported by the patient engine)
+        :param if_synchronized: set to True so that the k-th transition of each patient always uses the same
+                                random numbers; cohorts with the same id and population size simulated under
+                                different parameters then use common random numbers (the patient engine is
+                                always synchronized since each patient has its own random number stream and
+                                uses two random numbers per transition)
+        :param sampler: (TransitionSamplers) algorithm to sample transitions with
+                        (only used by the patient engine)
+        :param random_streams: (RandomStreams) how random number streams are created; either way the
+                               outcomes depend only on the cohort id and the index of each patient
+                               (LEGACY reproduces the results of earlier versions; the patient engine
+                               supports GENERATOR only with the INVERSE_CDF sampler, since the exponential
+                               distribution of np.random.Generator draws a varying number of random numbers,
+                               which would break common random numbers under the GILLESPIE sampler)
         """
 
-        # populate and simulate the cohort
-        for i in range(self.popSize):
-            # create a new patient (use id * pop_size + n as patient id)
-            patient = Patient(id=self.id * self.popSize + i,
-                              parameters=self.params)
-            # simulate
-            patient.simulate(sim_length)
-
-            # store outputs of this simulation
-            self.cohortOutcomes.extract_outcome(simulated_patient=patient)
+        if n_processes < 1:
+            raise ValueError('n_processes should be at least 1.')
+        if engine == SimulationEngines.PATIENT and sampler == TransitionSamplers.GILLESPIE \
+                and random_streams == RandomStreams.GENERATOR:
+            raise ValueError('The GILLESPIE sampler does not support GENERATOR random streams '
+                             '(use the INVERSE_CDF sampler).')
+
+        if engine == SimulationEngines.PATIENT:
+            self._simulate_patients(sim_length=sim_length, n_processes=n_processes, sampler=sampler,
+                                    random_streams=random_streams)
+        elif engine == SimulationEngines.BATCH:
+            if n_processes > 1:
+                raise ValueError('The batch engine does not support multiple processes.')
+            self._simulate_batch(sim_length=sim_length, if_synchronized=if_synchronized,
+                                 random_streams=random_streams)
+        else:
+            raise ValueError('Invalid simulation engine: {}.'.format(engine))
 
         # calculate cohort outcomes
         self.cohortOutcomes.calculate_cohort_outcomes(initial_pop_size=self.popSize)
 
+    def _simulate_patients(self, sim_length, n_processes, sampler, random_streams):
+        """ simulate the patients of this cohort one at a time, in one or more processes
+        (each patient is seeded by its id, so the outcomes do not depend on the number of processes)
+        :param sim_length: simulation length
+        :param n_processes: number of worker processes
+        :param sampler: (TransitionSamplers) algorithm to sample transitions with
+        :param random_streams: (RandomStreams) how random number streams are created
+        """
 
-class CohortOutcomes:
-    def __init__(self):
+        # id of the first patient (use id * pop_size + n as patient id)
+        first_id = self.id * self.popSize
+
+        if n_processes == 1:
+            # store outputs of this simulation directly in the outcomes of this cohort
+            simulate_patients(first_id=first_id,
+                              n_patients=self.popSize,
+                              parameters=self.params,
+                              sim_length=sim_length,
+                              sampler=sampler,
+                              random_streams=random_streams,
+                              cohort_id=self.id,
+                              outcomes=self.cohortOutcomes)
+        else:
+            # split the patients into contiguous shards, one per process
+            shard_sizes = [len(shard) for shard in np.array_split(range(self.popSize), n_processes)]
+            shard_first_indices = np.cumsum([0] + shard_sizes[:-1])
+
+            with ProcessPoolExecutor(max_workers=n_processes) as executor:
+                futures = [executor.submit(simulate_patients,
+                                           first_id=first_id + int(shard_first_index),
+                                           n_patients=shard_size,
+                                           parameters=self.params,
+                                           sim_length=sim_length,
+                                           if_streaming=self.ifStreaming,
+                                           if_record_trajectories=self.ifRecordTrajectories,
+                                           sampler=sampler,
+                                           random_streams=random_streams,
+                                           cohort_id=self.id,
+                                           first_index=int(shard_first_index))
+                           for shard_first_index, shard_size in zip(shard_first_indices, shard_sizes)]
+                shard_outcomes = [future.result() for future in futures]
+
+            # store outputs of this simulation (in the order of patient ids)
+            for outcomes in shard_outcomes:
+                self.cohortOutcomes.merge(other=outcomes)
+
+    def _simulate_batch(self, sim_length, if_synchronized, random_streams):
+        """ simulate all patients of this cohort together; at each step, every patient who is
+        still alive draws the time until and the destination of its next transition
+        (patients draw from one random number stream seeded by the cohort id, so individual
+        trajectories differ from those of the patient engine while the distribution of outcomes
+        is the same)
+        :param sim_length: simulation length
+        :param if_synchronized: set to True to draw random numbers for every patient at every step,
+                                so the k-th transition of a patient always uses the same random numbers
+        :param random_streams: (RandomStreams) how the random number stream of the cohort is created
+        """
+
+        # random number generator for this cohort
+        rng = get_rng(random_streams=random_streams, cohort_id=self.id)
+
+        # rate out of each state, absorbing states and cumulative probabilities of jumping to each state
+        exit_rates = self.params.compiledModel.exitRates
+        is_absorbing = self.params.compiledModel.isAbsorbing
+        cum_jump_probs = self.params.compiledModel.cumJumpProbs
+
+        # annual cost and utility of each health state
+        annual_costs = np.array(self.params.annualStateCosts, dtype=float) + self.params.annualTreatmentCost
+        annual_utilities = np.array(self.params.annualStateUtilities, dtype=float)
+        discount_rate = self.params.discountRate
+
+        # outcomes of each patient (nan if the event has not occurred)
+        survival_times = np.full(self.popSize, np.nan)
+        times_to_AIDS = np.full(self.popSize, np.nan)
+        costs = np.zeros(self.popSize)
+        utilities = np.zeros(self.popSize)
+
+        # working arrays of the patients who are not yet in an absorbing state: their indices,
+        # current states and times, and the cost and utility accumulated so far
+        # (patients are dropped from these arrays once they die or reach the simulation length,
+        # so each step only processes the patients still running)
+        states = np.full(self.popSize, self.params.initialHealthState.value)
+        active = np.flatnonzero(~is_absorbing[states])
+        current_states = states[active]
+        t0 = np.zeros(active.size)
+        active_costs = np.zeros(active.size)
+        active_utilities = np.zeros(active.size)
+
+        # number of patients still running at each step
+        active_set_sizes = []
+
+        while active.size > 0:
+
+            active_set_sizes.append(active.size)
+
+            # two random numbers for each patient
+            if if_synchronized:
+                u = rng.random(size=(self.popSize, 2))[active]
+            else:
+                u = rng.random(size=(active.size, 2))
+
+            # time until next event and next state (by inverting their cumulative distribution functions)
+            dt = -np.log(1 - u[:, 0]) / exit_rates.take(current_states)
+            new_states = np.count_nonzero(u[:, 1:] >= cum_jump_probs.take(current_states, axis=0), axis=1)
+
+            # patients whose next event occurs beyond the simulation length
+            # stay in their current state until the end of the simulation
+            t1 = t0 + dt
+            if_beyond = t1 > sim_length
+            t1[if_beyond] = sim_length
+            new_states[if_beyond] = current_states[if_beyond]
+
+            # discounted cost and utility (continuously compounded) since the last transition
+            discount_factors = get_discount_factors(discount_rate=discount_rate, starts=t0, ends=t1)
+            active_costs += annual_costs[current_states] * discount_factors
+            active_utilities += annual_utilities[current_states] * discount_factors
+
+            # record the transitions
+            if self.cohortOutcomes.trajectoryLog is not None:
+                self.cohortOutcomes.trajectoryLog.record_batch(patient_ids=self.id * self.popSize + active,
+                                                               times=t1,
+                                                               from_states=current_states,
+                                                               to_states=new_states)
+
+            # update survival time and time until AIDS
+            if_died = is_absorbing[new_states]
+            survival_times[active[if_died]] = t1[if_died]
+            if_AIDS = (current_states != HealthStates.AIDS.value) & (new_states == HealthStates.AIDS.value)
+            times_to_AIDS[active[if_AIDS]] = t1[if_AIDS]
+
+            # store the cost and utility of patients who died or reached the simulation length
+            if_done = if_died | if_beyond
+            done = np.flatnonzero(if_done)
+            costs[active[done]] = active_costs[done]
+            utilities[active[done]] = active_utilities[done]
+
+            # keep only patients who are still alive and within the simulation length
+            running = np.flatnonzero(~if_done)
+            active = active.take(running)
+            current_states = new_states.take(running)
+            t0 = t1.take(running)
+            active_costs = active_costs.take(running)
+            active_utilities = active_utilities.take(running)
+
+        self.activeSetSizes = np.array(active_set_sizes, dtype=int)
+
+        # store outputs of this simulation
+        self.cohortOutcomes.extract_outcomes(survival_times=survival_times,
+                                             times_to_AIDS=times_to_AIDS,
+                                             costs=costs,
+                                             utilities=utilities)
+
+
+class AnalyticCohort:
+    def __init__(self, parameters):
+        """ calculates the expected outcomes of a cohort exactly from the transition rate matrix
+        (the continuous-time Markov chain is solved analytically instead of simulated; the simulation
+        length is assumed long enough for all patients to die, as with SIM_LENGTH)
+        :param parameters: parameters
+        """
+        self.params = parameters
 
-        self.survivalTimes = []         # patients' survival times
-        self.timesToAIDS = []           # patients' times to AIDS
-        self.costs = []                 # patients' discounted costs
-        self.utilities =[]              # patients' discounted utilities
-        self.nLivingPatients = None     # survival curve (sample path of number of alive patients over time)
+        self.meanSurvivalTime = None        # expected survival time
+        self.meanTimeToAIDS = None          # expected time to AIDS among patients who develop AIDS
+        self.meanDiscountedCost = None      # expected discounted cost
+        self.meanDiscountedUtility = None   # expected discounted utility
 
-        self.statSurvivalTime = None    # summary statistics for survival time
-        self.statTimeToAIDS = None      # summary statistics for time to AIDS
-        self.statCost = None            # summary statistics for discounted cost
-        self.statUtility = None         # summary statistics for discounted utility
+    def evaluate(self):
+        """ calculates the expected outcomes of the cohort
+        :return: (tuple) (mean survival time, mean time to AIDS, mean discounted cost, mean discounted utility)
+        """
+
+        # transition rates between states and the rate out of each state
+        rates = self.params.compiledModel.rates
+        exit_rates = self.params.compiledModel.exitRates
+
+        # generator matrix restricted to the transient (not absorbing) states
+        transient = np.flatnonzero(exit_rates > 0)
+        q = rates[np.ix_(transient, transient)] - np.diag(exit_rates[transient])
+        # position of the initial state among the transient states
+        i0 = np.flatnonzero(transient == self.params.initialHealthState.value)[0]
+
+        # cost and utility (per unit of time) of each transient state
+        costs = np.array(self.params.annualStateCosts, dtype=float)[transient] + self.params.annualTreatmentCost
+        utilities = np.array(self.params.annualStateUtilities, dtype=float)[transient]
+
+        # expected discounted rewards solve (r*I - Q) v = reward rates
+        discounted = np.linalg.solve(self.params.discountRate * np.eye(len(transient)) - q,
+                                     np.column_stack((costs, utilities)))
+        self.meanDiscountedCost, self.meanDiscountedUtility = float(discounted[i0, 0]), float(discounted[i0, 1])
+
+        # expected time until absorption solves -Q m = 1
+        self.meanSurvivalTime = float(np.linalg.solve(-q, np.ones(len(transient)))[i0])
+
+        # time to AIDS: treat AIDS as absorbing and solve over the states before AIDS
+        # for the probability of reaching AIDS (-Q h = rates into AIDS)
+        # and the expected time to AIDS on those paths (-Q m = h)
+        pre_AIDS = np.flatnonzero(transient != HealthStates.AIDS.value)
+        if transient[i0] == HealthStates.AIDS.value or len(pre_AIDS) == 0:
+            self.meanTimeToAIDS = np.nan
+        else:
+            q_pre = q[np.ix_(pre_AIDS, pre_AIDS)]
+            i0_pre = np.flatnonzero(pre_AIDS == i0)[0]
+            prob_AIDS = np.linalg.solve(-q_pre, rates[transient[pre_AIDS], HealthStates.AIDS.value])
+            time_AIDS = np.linalg.solve(-q_pre, prob_AIDS)
+            self.meanTimeToAIDS = float(time_AIDS[i0_pre] / prob_AIDS[i0_pre]) if prob_AIDS[i0_pre] > 0 else np.nan
+
+        return self.meanSurvivalTime, self.meanTimeToAIDS, self.meanDiscountedCost, self.meanDiscountedUtility
+
+
+class CohortOccupancy:
+    def __init__(self, pop_size, parameters):
+        """ calculates the expected number of patients in each health state over a time grid
+        from P(t) = exp(Qt) (no simulation is needed)
+        :param pop_size: population size of this cohort
+        :param parameters: parameters
+        """
+        self.popSize = pop_size
+        self.params = parameters
+
+        self.times = None               # time points
+        self.stateProbs = None          # probability of being in each health state at each time point
+        self.expNLiving = None          # expected number of living patients at each time point
+        self.expNAIDS = None            # expected number of patients with AIDS at each time point
+        self.prevalenceAIDS = None      # proportion of living patients with AIDS at each time point
+        self._nLivingPatients = None
+
+    @property
+    def nLivingPatients(self):
+        """ survival curve as a sample path of expected number of living patients over time """
+
+        if self._nLivingPatients is None and self.expNLiving is not None:
+            from ct_hiv_model_econ_eval.path_classes import GridSamplePath
+            self._nLivingPatients = GridSamplePath(name='Expected # of living patients',
+                                                   times=self.times,
+                                                   values=self.expNLiving)
+        return self._nLivingPatients
+
+    def evaluate(self, times):
+        """ calculates the state occupancy over the specified time points
+        :param times: (list or np.array) non-decreasing, non-negative time points
+        """
+
+        self.times = np.asarray(times, dtype=float)
+        if self.times.ndim != 1 or np.any(self.times < 0) or np.any(np.diff(self.times) < 0):
+            raise ValueError('times should be a list of non-decreasing, non-negative time points.')
+
+        # generator matrix (rates out of each state on the diagonal)
+        exit_rates = self.params.compiledModel.exitRates
+        q = self.params.compiledModel.rates - np.diag(exit_rates)
+
+        # time steps between consecutive time points; the transition probability matrix
+        # of each distinct step is calculated only once (a single one for a uniform grid)
+        steps = np.diff(self.times, prepend=0)
+        distinct_steps, step_indices = np.unique(np.round(steps, decimals=12), return_inverse=True)
+        from scipy.linalg import expm   # imported here as only this calculation needs scipy
+        step_matrices = [expm(q * dt) for dt in distinct_steps]
+
+        # state probabilities at each time point
+        probs = np.zeros(len(HealthStates))
+        probs[self.params.initialHealthState.value] = 1
+        self.stateProbs = np.zeros((len(self.times), len(HealthStates)))
+        for k, step_index in enumerate(step_indices):
+            probs = probs @ step_matrices[step_index]
+            self.stateProbs[k] = probs
+
+        # expected number of living patients and patients with AIDS
+        prob_living = self.stateProbs[:, exit_rates > 0].sum(axis=1)
+        self.expNLiving = self.popSize * prob_living
+        self.expNAIDS = self.popSize * self.stateProbs[:, HealthStates.AIDS.value]
+        self.prevalenceAIDS = np.divide(self.stateProbs[:, HealthStates.AIDS.value], prob_living,
+                                        out=np.full(len(self.times), np.nan), where=prob_living > 0)
+
+        # the survival curve is rebuilt from these values when next used
+        self._nLivingPatients = None
+
+
+def simulate_patients(first_id, n_patients, parameters, sim_length, if_streaming=False,
+                      if_record_trajectories=False, sampler=TransitionSamplers.GILLESPIE,
+                      random_streams=RandomStreams.LEGACY, cohort_id=0, first_index=0, outcomes=None):
+    """ simulates patients with consecutive ids (used to simulate a shard of a cohort in a worker process)
+    :param first_id: id of the first patient
+    :param n_patients: number of patients to simulate
+    :param parameters: parameters
+    :param sim_length: simulation length
+    :param if_streaming: set to True to only keep summary statistics of patient outcomes
+    :param if_record_trajectories: set to True to record the transitions of the patients
+    :param sampler: (TransitionSamplers) algorithm to sample transitions with
+    :param random_streams: (RandomStreams) how the random number streams of the patients are created
+    :param cohort_id: id of the cohort the patients belong to
+    :param first_index: index of the first patient in the cohort
+    :param outcomes: (CohortOutcomes) to extract the outcomes of the patients into (if None, new outcomes
+                     created with if_streaming and if_record_trajectories)
+    :return: (CohortOutcomes) outcomes of the simulated patients (cohort outcomes are not calculated)
+    """
+
+    if outcomes is None:
+        outcomes = CohortOutcomes(pop_size=n_patients,
+                                  if_streaming=if_streaming,
+                                  if_record_trajectories=if_record_trajectories)
+    for k in range(n_patients):
+        # create and simulate a new patient
+        patient = Patient(id=first_id + k, parameters=parameters, trajectory_log=outcomes.trajectoryLog,
+                          sampler=sampler,
+                          rng=get_rng(random_streams=random_streams, cohort_id=cohort_id,
+                                      patient_index=first_index + k, patient_id=first_id + k))
+        patient.simulate(sim_length)
+
+        # store outputs of this simulation
+        outcomes.extract_outcome(simulated_patient=patient)
+
+    return outcomes
+
+
+class CohortOutcomes:
+    def __init__(self, pop_size=0, if_streaming=False, if_record_trajectories=False):
+        """
+        :param pop_size: number of patients to preallocate outcome arrays for
+                         (the arrays grow if more patients are extracted)
+        :param if_streaming: set to True to update summary statistics as patients are extracted
+                             instead of storing the outcome of each patient (the survival curve and
+                             outcome arrays are then not available)
+        :param if_record_trajectories: set to True to record the transitions of all patients in a
+                                       TrajectoryLog, from which new outcomes can be derived without
+                                       simulating again
+        """
+
+        self.ifStreaming = if_streaming
+        # transitions of all patients
+        self.trajectoryLog = TrajectoryLog(capacity=2 * pop_size) if if_record_trajectories else None
+        if if_streaming:
+            pop_size = 0
+
+        # outcomes of each patient in the order extracted, stored in preallocated arrays
+        # (nan for patients who did not die or did not develop AIDS)
+        self.nPatients = 0                                  # number of patients extracted so far
+        self.patientSurvivalTimes = np.full(pop_size, np.nan)   # patients' survival times
+        self.patientTimesToAIDS = np.full(pop_size, np.nan)     # patients' times to AIDS
+        self.patientCosts = np.zeros(pop_size)                  # patients' discounted costs
+        self.patientUtilities = np.zeros(pop_size)              # patients' discounted utilities
+
+        self.survivalTimes = None       # survival times of patients who died
+        self.timesToAIDS = None         # times to AIDS of patients who developed AIDS
+        self.costs = None               # patients' discounted costs
+        self.utilities = None           # patients' discounted utilities
+        self.initialPopSize = None      # initial population size of the cohort
+
+        # summary statistics and survival curves (built from the outcome arrays when first used,
+        # see the properties below, since most of them need deampy)
+        self._statSurvivalTime = None
+        self._statTimeToAIDS = None
+        self._statCost = None
+        self._statUtility = None
+        self._survivalCurve = None
+        self._nLivingPatients = None
+        # number of survival times in each bin of width HISTOGRAM_BIN_WIDTH (kept up to date when
+        # streaming since the survival times are then not stored, otherwise calculated when first used);
+        # when streaming, the array is doubled when a survival time falls beyond its last bin, and only
+        # its first _nSurvivalTimeBins bins are used
+        self._survivalTimeCounts = np.zeros(0, dtype=int) if if_streaming else None
+        self._nSurvivalTimeBins = 0
+
+        if if_streaming:
+            # statistics updated as patients are extracted since their outcomes are not stored
+            self._statSurvivalTime = OnePassStat(name='Survival time')
+            self._statTimeToAIDS = OnePassStat(name='Time until AIDS')
+            self._statCost = OnePassStat(name='Discounted cost')
+            self._statUtility = OnePassStat(name='Discounted utility')
+
+    @property
+    def statSurvivalTime(self):
+        """ summary statistics for survival time """
+        self._calculate_summary_stats()
+        return self._statSurvivalTime
+
+    @property
+    def statTimeToAIDS(self):
+        """ summary statistics for time to AIDS """
+        self._calculate_summary_stats()
+        return self._statTimeToAIDS
+
+    @property
+    def statCost(self):
+        """ summary statistics for discounted cost """
+        self._calculate_summary_stats()
+        return self._statCost
+
+    @property
+    def statUtility(self):
+        """ summary statistics for discounted utility """
+        self._calculate_summary_stats()
+        return self._statUtility
+
+    @property
+    def survivalTimeCounts(self):
+        """ number of survival times in each bin of width HISTOGRAM_BIN_WIDTH
+        (the k-th bin is [k * HISTOGRAM_BIN_WIDTH, (k + 1) * HISTOGRAM_BIN_WIDTH)) """
+
+        if self._survivalTimeCounts is None:
+            if self.survivalTimes is None:
+                return None
+            self._survivalTimeCounts = get_bin_counts(obs=self.survivalTimes, bin_width=data.HISTOGRAM_BIN_WIDTH)
+            self._nSurvivalTimeBins = len(self._survivalTimeCounts)
+        return self._survivalTimeCounts[:self._nSurvivalTimeBins]
+
+    @property
+    def survivalCurve(self):
+        """ survival curve (number of alive patients over time as a step function) """
+
+        if self._survivalCurve is None and self.survivalTimes is not None:
+            self._survivalCurve = SurvivalCurve(survival_times=self.survivalTimes, initial_size=self.initialPopSize)
+        return self._survivalCurve
+
+    @property
+    def nLivingPatients(self):
+        """ survival curve as a sample path of number of alive patients over time
+        (downsampled to no more than SURVIVAL_CURVE_MAX_POINTS points) """
+
+        if self._nLivingPatients is None and self.survivalCurve is not None:
+            from ct_hiv_model_econ_eval.path_classes import GridSamplePath
+            times, n_alive, min_n_alive = self.survivalCurve.get_downsampled_points(
+                max_points=data.SURVIVAL_CURVE_MAX_POINTS)
+            self._nLivingPatients = GridSamplePath(name='# of living patients', times=times, values=n_alive)
+        return self._nLivingPatients
 
     def extract_outcome(self, simulated_patient):
         """ extracts outcomes of a simulated patient
         :param simulated_patient: a simulated patient"""
 
+        if self.ifStreaming:
+            self.nPatients += 1
+            # update summary statistics
+            if simulated_patient.stateMonitor.survivalTime is not None:
+                self.statSurvivalTime.record(obs=simulated_patient.stateMonitor.survivalTime)
+                k = int(simulated_patient.stateMonitor.survivalTime // data.HISTOGRAM_BIN_WIDTH)
+                if k >= self._nSurvivalTimeBins:
+                    self._reserve_bins(n_bins=k + 1)
+                self._survivalTimeCounts[k] += 1
+            if simulated_patient.stateMonitor.timeToAIDS is not None:
+                self.statTimeToAIDS.record(obs=simulated_patient.stateMonitor.timeToAIDS)
+            self.statCost.record(obs=simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedCost)
+            self.statUtility.record(obs=simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedUtility)
+            return
+
+        i = self._reserve(n_patients=1)
+
         # record survival time and time until AIDS
         if simulated_patient.stateMonitor.survivalTime is not None:
-            self.survivalTimes.append(simulated_patient.stateMonitor.survivalTime)
+            self.patientSurvivalTimes[i] = simulated_patient.stateMonitor.survivalTime
         if simulated_patient.stateMonitor.timeToAIDS is not None:
-            self.timesToAIDS.append(simulated_patient.stateMonitor.timeToAIDS)
+            self.patientTimesToAIDS[i] = simulated_patient.stateMonitor.timeToAIDS
         # discounted cost and discounted utility
-        self.costs.append(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedCost)
-        self.utilities.append(simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedUtility)
+        self.patientCosts[i] = simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedCost
+        self.patientUtilities[i] = simulated_patient.stateMonitor.costUtilityMonitor.totalDiscountedUtility
+
+    def extract_outcomes(self, survival_times, times_to_AIDS, costs, utilities):
+        """ extracts outcomes of a cohort of patients simulated together
+        :param survival_times: (np.array) patients' survival times (nan for patients who did not die)
+        :param times_to_AIDS: (np.array) patients' times to AIDS (nan for patients who did not develop AIDS)
+        :param costs: (np.array) patients' discounted costs
+        :param utilities: (np.array) patients' discounted utilities
+        """
+
+        if self.ifStreaming:
+            self.nPatients += len(costs)
+            # update summary statistics
+            self.statSurvivalTime.record_batch(obs=survival_times[~np.isnan(survival_times)])
+            self._add_survival_time_counts(counts=get_bin_counts(obs=survival_times[~np.isnan(survival_times)],
+                                                                 bin_width=data.HISTOGRAM_BIN_WIDTH))
+            self.statTimeToAIDS.record_batch(obs=times_to_AIDS[~np.isnan(times_to_AIDS)])
+            self.statCost.record_batch(obs=costs)
+            self.statUtility.record_batch(obs=utilities)
+            return
+
+        i = self._reserve(n_patients=len(costs))
+        patients = slice(i, i + len(costs))
+
+        self.patientSurvivalTimes[patients] = survival_times
+        self.patientTimesToAIDS[patients] = times_to_AIDS
+        self.patientCosts[patients] = costs
+        self.patientUtilities[patients] = utilities
+
+    def merge(self, other):
+        """ appends the patient outcomes stored in another CohortOutcomes object
+        :param other: (CohortOutcomes) outcomes of another set of simulated patients
+        """
+
+        if self.trajectoryLog is not None and other.trajectoryLog is not None:
+            self.trajectoryLog.merge(other=other.trajectoryLog)
+
+        if other.ifStreaming:
+            if not self.ifStreaming:
+                raise ValueError('Outcomes kept as summary statistics can only be merged into '
+                                 'outcomes kept as summary statistics.')
+            self.nPatients += other.nPatients
+            self.statSurvivalTime.merge(other=other.statSurvivalTime)
+            self.statTimeToAIDS.merge(other=other.statTimeToAIDS)
+            self.statCost.merge(other=other.statCost)
+            self.statUtility.merge(other=other.statUtility)
+            self._add_survival_time_counts(counts=other.survivalTimeCounts)
+            return
+
+        self.extract_outcomes(survival_times=other.patientSurvivalTimes[:other.nPatients],
+                              times_to_AIDS=other.patientTimesToAIDS[:other.nPatients],
+                              costs=other.patientCosts[:other.nPatients],
+                              utilities=other.patientUtilities[:other.nPatients])
 
     def calculate_cohort_outcomes(self, initial_pop_size):
         """ calculates the cohort outcomes
         :param initial_pop_size: initial population size
         """
 
-        # summary statistics
-        self.statSurvivalTime = stats.SummaryStat(name='Survival time', data=self.survivalTimes)
-        self.statTimeToAIDS = stats.SummaryStat(name='Time until AIDS', data=self.timesToAIDS)
-        self.statCost = stats.SummaryStat(name='Discounted cost', data=self.costs)
-        self.statUtility = stats.SummaryStat(name='Discounted utility', data=self.utilities)
+        # summary statistics are already up to date
+        if self.ifStreaming:
+            return
+
+        # outcomes of the extracted patients
+        self.survivalTimes = self.patientSurvivalTimes[:self.nPatients]
+        self.survivalTimes = self.survivalTimes[~np.isnan(self.survivalTimes)]
+        self.timesToAIDS = self.patientTimesToAIDS[:self.nPatients]
+        self.timesToAIDS = self.timesToAIDS[~np.isnan(self.timesToAIDS)]
+        self.costs = self.patientCosts[:self.nPatients]
+        self.utilities = self.patientUtilities[:self.nPatients]
+        self.initialPopSize = initial_pop_size
+
+        # summary statistics, survival curve and histogram bin counts are rebuilt from these outcomes when next used
+        self._statSurvivalTime = None
+        self._statTimeToAIDS = None
+        self._statCost = None
+        self._statUtility = None
+        self._survivalCurve = None
+        self._nLivingPatients = None
+        self._survivalTimeCounts = None
+
+    def _calculate_summary_stats(self):
+        """ calculates the summary statistics of the cohort outcomes if they are not calculated yet
+        (jobs that only need the outcome arrays then never import deampy) """
+
+        if self._statCost is None and self.costs is not None:
+            import deampy.statistics as stats   # imported here to keep matplotlib out of simulation-only runs
+            self._statSurvivalTime = stats.SummaryStat(name='Survival time', data=self.survivalTimes)
+            self._statTimeToAIDS = stats.SummaryStat(name='Time until AIDS', data=self.timesToAIDS)
+            self._statCost = stats.SummaryStat(name='Discounted cost', data=self.costs)
+            self._statUtility = stats.SummaryStat(name='Discounted utility', data=self.utilities)
+
+    def _reserve(self, n_patients):
+        """ makes room to store the outcomes of more patients (doubling the arrays if they are full)
+        :param n_patients: number of patients to store
+        :return: index where the outcomes of the first of these patients should be stored
+        """
+
+        i = self.nPatients
+        self.nPatients += n_patients
+
+        capacity = len(self.patientCosts)
+        if self.nPatients > capacity:
+            extra = max(self.nPatients, 2 * capacity) - capacity
+            self.patientSurvivalTimes = np.append(self.patientSurvivalTimes, np.full(extra, np.nan))
+            self.patientTimesToAIDS = np.append(self.patientTimesToAIDS, np.full(extra, np.nan))
+            self.patientCosts = np.append(self.patientCosts, np.zeros(extra))
+            self.patientUtilities = np.append(self.patientUtilities, np.zeros(extra))
+
+        return i
+
+    def _reserve_bins(self, n_bins):
+        """ makes room to count survival times in more histogram bins (doubling the array if it is full)
+        :param n_bins: number of bins to count survival times in
+        """
+
+        self._nSurvivalTimeBins = max(self._nSurvivalTimeBins, n_bins)
 
-        # survival curve
-        self.nLivingPatients = PrevalencePathBatchUpdate(
-            name='# of living patients',
-            initial_size=initial_pop_size,
-            times_of_changes=self.survivalTimes,
-            increments=[-1] * len(self.survivalTimes)
-        )
+        capacity = len(self._survivalTimeCounts)
+        if self._nSurvivalTimeBins > capacity:
+            extra = max(self._nSurvivalTimeBins, 2 * capacity) - capacity
+            self._survivalTimeCounts = np.append(self._survivalTimeCounts, np.zeros(extra, dtype=int))
+
+    def _add_survival_time_counts(self, counts):
+        """ adds the number of other survival times in each histogram bin
+        :param counts: (np.array) number of other survival times in each bin of width HISTOGRAM_BIN_WIDTH
+        """
 
+        self._reserve_bins(n_bins=len(counts))
+        self._survivalTimeCounts[:len(counts)] += counts
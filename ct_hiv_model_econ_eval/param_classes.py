@@ -1,6 +1,6 @@
+from collections import OrderedDict
 from enum import Enum
 
-import deampy.markov as markov
 import numpy as np
 
 import ct_hiv_model_econ_eval.input_data as data
@@ -14,7 +14,18 @@ class Therapies(Enum):
 
 
 class Parameters:
-    def __init__(self, therapy):
+    def __init__(self, therapy, trans_matrix=data.TRANS_MATRIX, annual_state_costs=data.ANNUAL_STATE_COST,
+                 annual_state_utilities=data.ANNUAL_STATE_UTILITY, treatment_rr=data.TREATMENT_RR,
+                 trans_rate_matrix=None):
+        """
+        :param therapy: (Therapies) selected therapy
+        :param trans_matrix: (list of lists) counts (or probabilities) of transitions between hiv states
+        :param annual_state_costs: (list) annual cost of each health state
+        :param annual_state_utilities: (list) annual health utility of each health state
+        :param treatment_rr: relative risk of the combination treatment
+        :param trans_rate_matrix: (np.array) transition rate matrix of the selected therapy if already derived
+                                  (e.g. by get_trans_rate_matrices); trans_matrix and treatment_rr are then not used
+        """
 
         # selected therapy
         self.therapy = therapy
@@ -28,108 +39,303 @@ class Parameters:
         else:
             self.annualTreatmentCost = data.Zidovudine_COST + data.Lamivudine_COST
 
-        # calculate transition probabilities between hiv states
-        prob_matrix_mono = get_trans_prob_matrix(trans_matrix=data.TRANS_MATRIX)
+        # transition rate matrix of the selected therapy
+        if trans_rate_matrix is not None:
+            # use the rate matrix derived beforehand
+            self.transRateMatrix = np.array(trans_rate_matrix, dtype=float)
+            fill_generator_diagonal(self.transRateMatrix)
 
-        # transition probability matrix of the selected therapy
-        self.transRateMatrix = []
+        else:
+            # calculate transition probabilities between hiv states
+            prob_matrix_mono = get_trans_prob_matrix(trans_matrix=trans_matrix)
+
+            if self.therapy == Therapies.MONO:
+                # calculate transition rate matrix for the mono therapy
+                self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_mono)
+
+            elif self.therapy == Therapies.COMBO:
+                # calculate transition probability matrix for the combination therapy
+                self.transRateMatrix = get_trans_rate_matrix_combo(
+                    rate_matrix_mono=get_trans_rate_matrix(trans_prob_matrix=prob_matrix_mono),
+                    prob_matrix_mono=prob_matrix_mono,
+                    combo_rr=treatment_rr)
+
+        # quantities derived from the transition rate matrix that are shared by all patients
+        self.compiledModel = CompiledModel(trans_rate_matrix=self.transRateMatrix)
+        # the same parameters may be shared by many cohorts (see ParametersCache)
+        self.transRateMatrix.setflags(write=False)
+
+        # annual state costs and utilities (copied into tuples so that neither the caller's lists
+        # nor the shared parameters can be changed through each other)
+        self.annualStateCosts = tuple(annual_state_costs)
+        self.annualStateUtilities = tuple(annual_state_utilities)
 
-        if self.therapy == Therapies.MONO:
-            # calculate transition rate matrix for the mono therapy
-            self.transRateMatrix = get_trans_rate_matrix(trans_prob_matrix=prob_matrix_mono)
+        # discount rate
+        self.discountRate = data.DISCOUNT
 
-        elif self.therapy == Therapies.COMBO:
-            # calculate transition probability matrix for the combination therapy
-            self.transRateMatrix = get_trans_rate_matrix_combo(
-                rate_matrix_mono=get_trans_rate_matrix(trans_prob_matrix=prob_matrix_mono),
-                prob_matrix_mono=prob_matrix_mono,
-                combo_rr=data.TREATMENT_RR)
 
-        # annual state costs and utilities
-        self.annualStateCosts = data.ANNUAL_STATE_COST
-        self.annualStateUtilities = data.ANNUAL_STATE_UTILITY
+class ParametersCache:
+    def __init__(self, max_size=data.PARAMETERS_CACHE_SIZE):
+        """ creates Parameters once for each distinct therapy and set of input values and returns the same
+        object for later requests (the returned parameters are shared, so their arrays are read-only
+        and their costs and utilities are tuples)
+        :param max_size: maximum number of parameters to keep (the least recently used are dropped)
+        """
+        self.maxSize = max_size
+        self.nHits = 0      # number of requests answered from the cache
+        self.nMisses = 0    # number of requests for which parameters were created
+
+        self._parameters = OrderedDict()    # parameters by key, from the least to the most recently used
+
+    def get_parameters(self, therapy, trans_matrix=data.TRANS_MATRIX, annual_state_costs=data.ANNUAL_STATE_COST,
+                       annual_state_utilities=data.ANNUAL_STATE_UTILITY, treatment_rr=data.TREATMENT_RR,
+                       trans_rate_matrix=None):
+        """
+        :param therapy: (Therapies) selected therapy
+        :param trans_matrix: (list of lists) counts (or probabilities) of transitions between hiv states
+        :param annual_state_costs: (list) annual cost of each health state
+        :param annual_state_utilities: (list) annual health utility of each health state
+        :param treatment_rr: relative risk of the combination treatment
+        :param trans_rate_matrix: (np.array) transition rate matrix of the selected therapy if already derived
+        :return: (Parameters) parameters for the therapy and input values
+        """
+
+        key = (therapy,
+               get_values_key(trans_matrix),
+               get_values_key(annual_state_costs),
+               get_values_key(annual_state_utilities),
+               get_values_key(treatment_rr),
+               None if trans_rate_matrix is None else get_values_key(trans_rate_matrix))
+
+        if key in self._parameters:
+            self.nHits += 1
+            self._parameters.move_to_end(key)
+            return self._parameters[key]
+
+        self.nMisses += 1
+        parameters = Parameters(therapy=therapy,
+                                trans_matrix=trans_matrix,
+                                annual_state_costs=annual_state_costs,
+                                annual_state_utilities=annual_state_utilities,
+                                treatment_rr=treatment_rr,
+                                trans_rate_matrix=trans_rate_matrix)
+        self._parameters[key] = parameters
+        # drop the least recently used parameters
+        if len(self._parameters) > self.maxSize:
+            self._parameters.popitem(last=False)
+
+        return parameters
+
+    def get_hit_rate(self):
+        """ :return: proportion of requests answered from the cache """
+
+        n_requests = self.nHits + self.nMisses
+        return self.nHits / n_requests if n_requests > 0 else 0
+
+    def clear(self):
+        """ removes all parameters and resets the statistics """
+
+        self._parameters.clear()
+        self.nHits = 0
+        self.nMisses = 0
+
+
+def get_values_key(values):
+    """
+    :param values: a number, or a list (of lists) or array of numbers
+    :return: a hashable key that is equal for equal values
+    """
 
-        # discount rate
-        self.discountRate = data.DISCOUNT
+    values = np.asarray(values, dtype=float)
+    return values.shape, values.tobytes()
+
+
+# cache shared by the functions below
+_cache = ParametersCache()
+
+
+def get_parameters(therapy, **input_values):
+    """ returns the parameters from a cache shared by the module (see ParametersCache.get_parameters)
+    :param therapy: (Therapies) selected therapy
+    :param input_values: input values that differ from input_data (trans_matrix, annual_state_costs, etc.)
+    :return: (Parameters) parameters for the therapy and input values (shared and read-only)
+    """
+    return _cache.get_parameters(therapy=therapy, **input_values)
+
+
+def get_parameters_cache():
+    """ :return: (ParametersCache) the cache used by get_parameters (e.g. to check its hit rate) """
+    return _cache
+
+
+class CompiledModel:
+    def __init__(self, trans_rate_matrix):
+        """ quantities derived once from a transition rate matrix to simulate transitions
+        :param trans_rate_matrix: (np.array or list of lists) transition rate matrix
+        """
+
+        # transition rates between states (0 on the diagonal)
+        self.rates = get_rate_array(trans_rate_matrix=trans_rate_matrix)
+        # rate out of each state
+        self.exitRates = self.rates.sum(axis=1)
+        # states with no rate out
+        self.isAbsorbing = self.exitRates == 0
+        # cumulative probabilities of jumping to each state (rows of absorbing states are not used)
+        self.cumJumpProbs = np.cumsum(self.rates, axis=1)
+        self.cumJumpProbs[~self.isAbsorbing] /= self.cumJumpProbs[~self.isAbsorbing, -1:]
+
+        # read-only like the transition rate matrix of the parameters they are compiled from
+        for array in (self.rates, self.exitRates, self.isAbsorbing, self.cumJumpProbs):
+            array.setflags(write=False)
+
+        self._gillespie = None  # gillespie algorithm (created when first needed)
+
+    def get_gillespie(self):
+        """ :return: (deampy.markov.Gillespie) gillespie algorithm for the transition rate matrix """
+
+        if self._gillespie is None:
+            from deampy.markov import Gillespie     # imported here to keep matplotlib out of runs that do not need it
+            # (deampy requires non-negative rates, so the rates without the diagonal are used)
+            self._gillespie = Gillespie(transition_rate_matrix=self.rates)
+        return self._gillespie
+
+
+def get_rate_array(trans_rate_matrix):
+    """
+    :param trans_rate_matrix: (np.array or list of lists) transition rate matrix (None or any value on the diagonal)
+    :return: (np.array) transition rates between states with 0 on the diagonal
+    """
+
+    rates = np.array(trans_rate_matrix, dtype=float)
+    np.fill_diagonal(rates, 0)
+    return rates
+
+
+def fill_generator_diagonal(rate_matrix):
+    """ sets the diagonal of a transition rate matrix (or of each matrix in a stack) to minus the rate
+    out of each state, so that every row sums to 0
+    :param rate_matrix: (np.array) transition rate matrix (or stack of matrices) to update in place
+    """
+
+    diagonal = np.arange(rate_matrix.shape[-1])
+    rate_matrix[..., diagonal, diagonal] = 0
+    rate_matrix[..., diagonal, diagonal] -= rate_matrix.sum(axis=-1)
 
 
 def get_trans_prob_matrix(trans_matrix):
     """
     :param trans_matrix: transition matrix containing counts of transitions between states
-    :return: transition probability matrix
+                         (or a stack of such matrices with shape (K, 3, 4))
+    :return: (np.array) transition probability matrix (or stack of matrices)
     """
 
-    # initialize transition probability matrix
-    trans_prob_matrix = []
+    counts = np.asarray(trans_matrix, dtype=float)
+    # divide the counts in each row by the total of the row
+    return counts / counts.sum(axis=-1, keepdims=True)
 
-    # for each row in the transition matrix
-    for row in trans_matrix:
-        # calculate the transition probabilities
-        prob_row = np.array(row)/sum(row)
-        # add this row of transition probabilities to the transition probability matrix
-        trans_prob_matrix.append(prob_row)
 
-    return trans_prob_matrix
+def discrete_to_continuous(trans_prob_matrix, delta_t):
+    """ converts [p_ij] to [lambda_ij] where
+    lambda_ij = -ln(p_ii) * p_ij / ((1-p_ii)*delta_t) (as deampy.markov.discrete_to_continuous)
+    :param trans_prob_matrix: (np.array) transition probability matrix with a row for each of the first
+                              states (or a stack of such matrices)
+    :param delta_t: cycle length
+    :return: (np.array) transition rates (0 on the diagonal)
+    """
+
+    probs = np.asarray(trans_prob_matrix, dtype=float)
+    n_rows = probs.shape[-2]
+    stay_probs = probs[..., np.arange(n_rows), np.arange(n_rows)][..., np.newaxis]
+
+    # rates are zero out of absorbing states
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = np.where(stay_probs == 1, 0.0, -np.log(stay_probs) * probs / ((1 - stay_probs) * delta_t))
+    rates[..., np.arange(n_rows), np.arange(n_rows)] = 0
+    return rates
 
 
 def get_trans_rate_matrix(trans_prob_matrix):
+    """
+    :param trans_prob_matrix: (np.array) transition probability matrix between hiv states under mono therapy
+                              (or a stack of such matrices with shape (K, 3, 4))
+    :return: (np.array) transition rate matrix under mono therapy (or stack of matrices with shape (K, 5, 5))
+             with minus the rate out of each state on the diagonal
+    """
 
-    # find the transition rate matrix
-    trans_rate_matrix = markov.discrete_to_continuous(
-        trans_prob_matrix=trans_prob_matrix,
-        delta_t=1)
+    probs = np.asarray(trans_prob_matrix, dtype=float)
 
-    # calculate background mortality rate
-    mortality_rate = -np.log(1 - data.ANNUAL_PROB_BACKGROUND_MORT)
+    trans_rate_matrix = np.zeros(probs.shape[:-2] + (len(HealthStates), len(HealthStates)))
 
-    # add background mortality rate
-    for row in trans_rate_matrix:
-        row.append(mortality_rate)
+    # find the transition rates between hiv states and to HIV death
+    # (the rows for HIV death and natural death stay 0)
+    n_hiv_states, n_next_states = probs.shape[-2:]
+    trans_rate_matrix[..., :n_hiv_states, :n_next_states] = discrete_to_continuous(
+        trans_prob_matrix=probs,
+        delta_t=1)
 
-    # add 2 rows for HIV death and natural death
-    trans_rate_matrix.append([0] * len(HealthStates))
-    trans_rate_matrix.append([0] * len(HealthStates))
+    # add background mortality rate
+    trans_rate_matrix[..., :n_hiv_states, HealthStates.NATUAL_DEATH.value] = \
+        -np.log(1 - data.ANNUAL_PROB_BACKGROUND_MORT)
 
+    fill_generator_diagonal(trans_rate_matrix)
     return trans_rate_matrix
 
 
 def get_hr(p0, rr):
     """
-    :param p0: (float) the probability of an event in the control group
-    :param rr: (float) relative risk
-    :return: (float) hazard ratio
+    :param p0: (float or np.array) the probability of an event in the control group
+    :param rr: (float or np.array) relative risk
+    :return: (float or np.array) hazard ratio
     """
     return np.log(1 - p0 * rr) / np.log(1 - p0)
 
 
 def get_trans_rate_matrix_combo(rate_matrix_mono, prob_matrix_mono, combo_rr):
     """
-    :param rate_matrix_mono: (list of lists) transition rate matrix under mono therapy
-    :param prob_matrix_mono: (list of lists) transition probability matrix under mono therapy
-    :param combo_rr: relative risk of the combination treatment
-    :returns (list of lists) transition rate matrix under combination therapy """
-
-    # create an empty list of lists
-    matrix_combo = []
-    for row in rate_matrix_mono:
-        matrix_combo.append([0]*len(row))  # adding a row [0, 0, 0, 0, 0]
-
-    # populate the combo matrix
-    # calculate the effect of combo-therapy on non-diagonal elements
-    for s in range(len(matrix_combo)):
-        # rates to HIV states
-        for next_s in range(s + 1, len(HealthStates)-1):
-            # calculate hazard ratio
-            hr = get_hr(p0=rate_matrix_mono[s][next_s], rr=combo_rr)
-            # calculate the rate under combo therapy
-            matrix_combo[s][next_s] = hr * rate_matrix_mono[s][next_s]
-
-        # rates of background mortality
-        matrix_combo[s][-1] = rate_matrix_mono[s][-1]
+    :param rate_matrix_mono: (np.array) transition rate matrix under mono therapy (or a stack of matrices)
+    :param prob_matrix_mono: (np.array) transition probability matrix under mono therapy (or a stack of matrices)
+    :param combo_rr: relative risk of the combination treatment (or an array with one for each matrix in the stack)
+    :returns (np.array) transition rate matrix under combination therapy (or stack of matrices) """
+
+    rate_matrix_mono = np.asarray(rate_matrix_mono, dtype=float)
+    n_states = rate_matrix_mono.shape[-1]
+    combo_rr = np.asarray(combo_rr, dtype=float)[..., np.newaxis, np.newaxis]
+
+    # the combination therapy changes the rates to the next HIV states
+    # (the upper triangle without the background mortality column)
+    if_affected = np.triu(np.ones((n_states, n_states), dtype=bool), k=1)
+    if_affected[:, HealthStates.NATUAL_DEATH.value] = False
+
+    # calculate the rates under combo therapy from the hazard ratios
+    with np.errstate(divide='ignore', invalid='ignore'):
+        matrix_combo = np.where(if_affected, get_hr(p0=rate_matrix_mono, rr=combo_rr) * rate_matrix_mono, 0.0)
+
+    # rates of background mortality
+    matrix_combo[..., HealthStates.NATUAL_DEATH.value] = rate_matrix_mono[..., HealthStates.NATUAL_DEATH.value]
 
+    fill_generator_diagonal(matrix_combo)
     return matrix_combo
 
 
+def get_trans_rate_matrices(trans_matrices, therapy, treatment_rrs=data.TREATMENT_RR):
+    """ builds the transition rate matrices for a stack of transition count matrices at once
+    :param trans_matrices: (np.array) transition counts (or probabilities) with shape (K, 3, 4)
+    :param therapy: (Therapies) selected therapy
+    :param treatment_rrs: relative risk of the combination treatment (or an array of K relative risks)
+    :return: (np.array) transition rate matrices with shape (K, 5, 5)
+    """
+
+    prob_matrices = get_trans_prob_matrix(trans_matrix=trans_matrices)
+    rate_matrices = get_trans_rate_matrix(trans_prob_matrix=prob_matrices)
+
+    if therapy == Therapies.COMBO:
+        rate_matrices = get_trans_rate_matrix_combo(rate_matrix_mono=rate_matrices,
+                                                    prob_matrix_mono=prob_matrices,
+                                                    combo_rr=treatment_rrs)
+
+    return rate_matrices
+
+
 # tests
 if __name__ == '__main__':
     probMatrixMono = get_trans_prob_matrix(data.TRANS_MATRIX)
@@ -0,0 +1,24 @@
+import numpy as np
+from deampy.sample_path import PrevalenceSamplePath
+
+
+class GridSamplePath(PrevalenceSamplePath):
+    """ a sample path with values known at a grid of time points
+    (built with the public populate method of deampy's PrevalenceSamplePath, checked with deampy 1.4.6) """
+
+    def __init__(self, name, times, values):
+        """
+        :param name: name of this sample path
+        :param times: (list or np.array) time points
+        :param values: (list or np.array) values of the sample path at the time points
+        """
+
+        if len(times) != len(values):
+            raise ValueError('The list of times should be the same size as the list of values.')
+
+        times = np.asarray(times, dtype=float).tolist()
+        values = np.asarray(values, dtype=float).tolist()
+
+        PrevalenceSamplePath.__init__(self, name=name, initial_size=values[0] if len(values) > 0 else 0,
+                                      collect_stat=False)
+        self.populate(times=times, values=values)
@@ -0,0 +1,283 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import ct_hiv_model_econ_eval.input_data as data
+import ct_hiv_model_econ_eval.model_classes as model
+from ct_hiv_model_econ_eval.param_classes import Parameters, Therapies, get_trans_rate_matrices
+
+
+def sample_parameter_values(rng):
+    """ samples the model inputs from their uncertainty distributions
+    :param rng: random number generator
+    :return: (dict) keyword arguments to create Parameters with
+    """
+
+    # transition probabilities: Dirichlet over each row of the transition counts
+    # (transitions that were never observed keep probability 0)
+    trans_matrix = []
+    for row in data.TRANS_MATRIX:
+        counts = np.array(row, dtype=float)
+        probs = np.zeros(len(counts))
+        probs[counts > 0] = rng.dirichlet(counts[counts > 0])
+        trans_matrix.append(probs)
+
+    # annual state costs: gamma with the specified coefficient of variation
+    annual_state_costs = []
+    for cost in data.ANNUAL_STATE_COST:
+        if cost > 0:
+            shape = 1 / data.PSA_COST_CV ** 2
+            annual_state_costs.append(rng.gamma(shape=shape, scale=cost / shape))
+        else:
+            annual_state_costs.append(0)
+
+    # annual state utilities: beta with the specified coefficient of variation
+    annual_state_utilities = []
+    for utility in data.ANNUAL_STATE_UTILITY:
+        if 0 < utility < 1:
+            var = (data.PSA_UTILITY_CV * utility) ** 2
+            a_plus_b = utility * (1 - utility) / var - 1
+            annual_state_utilities.append(rng.beta(a=utility * a_plus_b, b=(1 - utility) * a_plus_b))
+        else:
+            annual_state_utilities.append(utility)
+
+    # treatment relative risk: lognormal fitted to the 95% confidence interval
+    log_ci = np.log(data.TREATMENT_RR_CI)
+    treatment_rr = rng.lognormal(mean=np.log(data.TREATMENT_RR), sigma=(log_ci[1] - log_ci[0]) / (2 * 1.96))
+
+    return dict(trans_matrix=trans_matrix,
+                annual_state_costs=annual_state_costs,
+                annual_state_utilities=annual_state_utilities,
+                treatment_rr=treatment_rr)
+
+
+def get_psa_inputs():
+    """ :return: (dict) the model inputs that the outcomes of a draw depend on: those sampled from
+             (see sample_parameter_values) and those kept fixed across draws """
+    return {'TRANS_MATRIX': data.TRANS_MATRIX,
+            'ANNUAL_STATE_COST': data.ANNUAL_STATE_COST,
+            'PSA_COST_CV': data.PSA_COST_CV,
+            'ANNUAL_STATE_UTILITY': data.ANNUAL_STATE_UTILITY,
+            'PSA_UTILITY_CV': data.PSA_UTILITY_CV,
+            'TREATMENT_RR': data.TREATMENT_RR,
+            'TREATMENT_RR_CI': data.TREATMENT_RR_CI,
+            'ANNUAL_PROB_BACKGROUND_MORT': data.ANNUAL_PROB_BACKGROUND_MORT,
+            'Zidovudine_COST': data.Zidovudine_COST,
+            'Lamivudine_COST': data.Lamivudine_COST,
+            'DISCOUNT': data.DISCOUNT}
+
+
+def sample_draws(seed, n_draws):
+    """ samples the model inputs of many draws (each draw with a random number generator that depends
+    only on the seed and the draw index)
+    :param seed: (int) seed of the probabilistic sensitivity analysis
+    :param n_draws: number of draws
+    :return: (dict) sampled inputs stacked over draws: 'trans_matrix' (n_draws, 3, 4), 'annual_state_costs',
+             'annual_state_utilities' (n_draws, 4) and 'treatment_rr' (n_draws)
+    """
+
+    draws = [sample_parameter_values(rng=np.random.RandomState(seed=[seed, draw])) for draw in range(n_draws)]
+    return {name: np.array([values[name] for values in draws], dtype=float) for name in draws[0]}
+
+
+def get_draws_trans_rate_matrices(sampled_values):
+    """ derives the transition rate matrices of all draws at once
+    :param sampled_values: (dict) sampled inputs stacked over draws (see sample_draws)
+    :return: (np.array) transition rate matrices with shape (n therapies, n_draws, 5, 5)
+             (the matrices of each therapy are contiguous)
+    """
+
+    return np.stack([get_trans_rate_matrices(trans_matrices=sampled_values['trans_matrix'],
+                                             therapy=therapy,
+                                             treatment_rrs=sampled_values['treatment_rr'])
+                     for therapy in Therapies])
+
+
+def simulate_draw(draw, pop_size, sim_length, engine, annual_state_costs, annual_state_utilities,
+                  trans_rate_matrices):
+    """ simulates a cohort under each therapy with the sampled inputs of a draw
+    (used to simulate a draw in a worker process)
+    :param draw: (int) index of the parameter set
+    :param pop_size: population size of each cohort
+    :param sim_length: simulation length
+    :param engine: (SimulationEngines) the engine to simulate the cohorts with
+    :param annual_state_costs: (np.array) sampled annual cost of each health state
+    :param annual_state_utilities: (np.array) sampled annual health utility of each health state
+    :param trans_rate_matrices: (np.array) transition rate matrix of each therapy for this draw
+    :return: (list) [draw, mean cost and mean utility under each therapy]
+    """
+
+    result = [draw]
+    for therapy in Therapies:
+        # both cohorts use the draw index as id so the therapies are compared with common random numbers
+        cohort = model.Cohort(id=draw,
+                              pop_size=pop_size,
+                              parameters=Parameters(therapy=therapy,
+                                                    annual_state_costs=annual_state_costs,
+                                                    annual_state_utilities=annual_state_utilities,
+                                                    trans_rate_matrix=trans_rate_matrices[therapy.value]),
+                              if_streaming=True)
+        cohort.simulate(sim_length=sim_length, engine=engine, if_synchronized=True)
+        result.extend([cohort.cohortOutcomes.statCost.get_mean(),
+                       cohort.cohortOutcomes.statUtility.get_mean()])
+
+    return result
+
+
+class PSA:
+    def __init__(self, n_draws, pop_size, seed=0, file_name=None):
+        """ probabilistic sensitivity analysis: simulates both therapies for parameter sets sampled from
+        the uncertainty distributions of the model inputs
+        :param n_draws: number of parameter sets
+        :param pop_size: population size of the cohort simulated for each parameter set and therapy
+        :param seed: seed to sample the parameter sets
+        :param file_name: (string) csv file to store the outcome of each draw as soon as it is simulated;
+                          if the file exists, the draws already stored in it are not simulated again
+                          (the settings and model inputs of the draws are stored next to it in a
+                          .settings.json file, and resuming with other ones raises an error)
+        """
+        self.nDraws = n_draws
+        self.popSize = pop_size
+        self.seed = seed
+        self.fileName = file_name
+
+        # sampled inputs of all draws and the transition rate matrices derived from them
+        # (the parameter set of each draw depends only on the seed and the draw index)
+        self.sampledValues = sample_draws(seed=seed, n_draws=n_draws)
+        self.transRateMatrices = get_draws_trans_rate_matrices(sampled_values=self.sampledValues)
+
+        # mean discounted cost and utility of each draw (rows) under each therapy (columns)
+        self.meanCosts = np.full((n_draws, len(Therapies)), np.nan)
+        self.meanEffects = np.full((n_draws, len(Therapies)), np.nan)
+
+    def run(self, sim_length, n_processes=1, engine=model.SimulationEngines.BATCH):
+        """ simulates the draws that are not completed yet
+        :param sim_length: simulation length
+        :param n_processes: number of worker processes
+        :param engine: (SimulationEngines) the engine to simulate the cohorts with
+        """
+
+        # settings and model inputs that the outcome of a draw depends on, as they are read back from json
+        # (a results file written with other settings cannot be resumed)
+        settings = json.loads(json.dumps({'seed': self.seed, 'pop_size': self.popSize, 'sim_length': sim_length,
+                                          'engine': engine.name, 'inputs': get_psa_inputs()}))
+
+        # draws completed in a previous run
+        completed_rows = []
+        if self.fileName is not None and os.path.isfile(self.fileName):
+            self._check_settings(settings=settings)
+            completed_rows = self._read_results()
+        for row in completed_rows:
+            self._store(row)
+        completed = set(row[0] for row in completed_rows)
+        remaining = [draw for draw in range(self.nDraws) if draw not in completed]
+
+        # rewrite the results file with the completed draws (dropping any row that was only
+        # partially written when a previous run was interrupted) and then append the outcome
+        # of each draw as it is simulated; the file is replaced only once the completed draws
+        # are written, so an interruption never loses them
+        results_file = None
+        if self.fileName is not None:
+            with open(self.fileName + '.tmp', 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow(['Draw', 'Cost Mono', 'Utility Mono', 'Cost Combo', 'Utility Combo'])
+                writer.writerows(completed_rows)
+            self._write_settings(settings=settings)
+            os.replace(self.fileName + '.tmp', self.fileName)
+            results_file = open(self.fileName, 'a', newline='')
+
+        try:
+            if n_processes == 1:
+                for draw in remaining:
+                    self._record(row=simulate_draw(sim_length=sim_length, engine=engine, **self._get_draw(draw)),
+                                 results_file=results_file)
+            else:
+                with ProcessPoolExecutor(max_workers=n_processes) as executor:
+                    futures = [executor.submit(simulate_draw, sim_length=sim_length, engine=engine,
+                                               **self._get_draw(draw))
+                               for draw in remaining]
+                    for future in as_completed(futures):
+                        self._record(row=future.result(), results_file=results_file)
+        finally:
+            if results_file is not None:
+                results_file.close()
+
+    def _get_settings_file_name(self):
+        """ :return: (string) json file that stores the settings of the draws in the results file """
+        return os.path.splitext(self.fileName)[0] + '.settings.json'
+
+    def _check_settings(self, settings):
+        """ raises an error if the results file was written with other settings
+        :param settings: (dict) settings of this run
+        """
+
+        settings_file_name = self._get_settings_file_name()
+        if not os.path.isfile(settings_file_name):
+            raise ValueError('Cannot resume from {} since the settings it was written with ({}) are missing; '
+                             'remove the results file to start over.'.format(self.fileName, settings_file_name))
+
+        with open(settings_file_name) as file:
+            stored_settings = json.load(file)
+
+        # names of the settings (and model inputs) that differ
+        stored_inputs = stored_settings.get('inputs', {})
+        different = [name for name in settings if name != 'inputs' and stored_settings.get(name) != settings[name]]
+        different += [name for name in sorted(set(settings['inputs']) | set(stored_inputs))
+                      if stored_inputs.get(name) != settings['inputs'].get(name)]
+        if len(different) > 0:
+            raise ValueError('Cannot resume from {} since it was written with other values of {}; '
+                             'remove the results file to start over.'.format(self.fileName, ', '.join(different)))
+
+    def _write_settings(self, settings):
+        """ writes the settings of this run next to the results file
+        :param settings: (dict) settings of this run
+        """
+
+        settings_file_name = self._get_settings_file_name()
+        with open(settings_file_name + '.tmp', 'w') as file:
+            json.dump(settings, file)
+        os.replace(settings_file_name + '.tmp', settings_file_name)
+
+    def _get_draw(self, draw):
+        """ :return: (dict) keyword arguments of simulate_draw that describe the draw """
+
+        return dict(draw=draw,
+                    pop_size=self.popSize,
+                    annual_state_costs=self.sampledValues['annual_state_costs'][draw],
+                    annual_state_utilities=self.sampledValues['annual_state_utilities'][draw],
+                    trans_rate_matrices=self.transRateMatrices[:, draw])
+
+    def _record(self, row, results_file):
+        """ stores the outcomes of a draw and appends them to the results file """
+
+        self._store(row)
+        if results_file is not None:
+            csv.writer(results_file).writerow(row)
+            results_file.flush()
+
+    def _store(self, row):
+        """ stores the outcomes of a draw ([draw, cost mono, utility mono, cost combo, utility combo]) """
+
+        draw = row[0]
+        if draw < self.nDraws:
+            self.meanCosts[draw] = row[1::2]
+            self.meanEffects[draw] = row[2::2]
+
+    def _read_results(self):
+        """ :return: (list) rows of the results file as [draw, cost mono, utility mono, ...] """
+
+        rows = []
+        with open(self.fileName, newline='') as file:
+            reader = csv.reader(file)
+            next(reader, None)  # header
+            for row in reader:
+                # skip rows that were only partially written
+                if len(row) == 1 + 2 * len(Therapies):
+                    try:
+                        rows.append([int(row[0])] + [float(v) for v in row[1:]])
+                    except ValueError:
+                        pass
+        return rows
@@ -0,0 +1,96 @@
+import numpy as np
+
+import ct_hiv_model_econ_eval.input_data as data
+from ct_hiv_model_econ_eval.input_data import HealthStates
+from ct_hiv_model_econ_eval.model_classes import get_discount_factors
+from ct_hiv_model_econ_eval.param_classes import Therapies
+
+
+class CostScenario:
+    def __init__(self, therapy, annual_state_costs=data.ANNUAL_STATE_COST,
+                 annual_state_utilities=data.ANNUAL_STATE_UTILITY,
+                 zidovudine_cost=data.Zidovudine_COST, lamivudine_cost=data.Lamivudine_COST,
+                 discount_rate=data.DISCOUNT):
+        """ the inputs that only affect how costs and utilities accumulate (not the transitions)
+        :param therapy: (Therapies) therapy of the simulated cohort
+        :param annual_state_costs: (list) annual cost of each health state
+        :param annual_state_utilities: (list) annual health utility of each health state
+        :param zidovudine_cost: annual cost of zidovudine
+        :param lamivudine_cost: annual cost of lamivudine
+        :param discount_rate: annual discount rate
+        """
+
+        # annual treatment cost
+        if therapy == Therapies.MONO:
+            self.annualTreatmentCost = zidovudine_cost
+        else:
+            self.annualTreatmentCost = zidovudine_cost + lamivudine_cost
+
+        # annual cost and utility of each health state (the treatment is paid while alive)
+        self.annualCosts = np.zeros(len(HealthStates))
+        self.annualUtilities = np.zeros(len(HealthStates))
+        self.annualCosts[:len(annual_state_costs)] = annual_state_costs
+        self.annualUtilities[:len(annual_state_utilities)] = annual_state_utilities
+        self.annualCosts[:HealthStates.HIV_DEATH.value] += self.annualTreatmentCost
+
+        self.discountRate = discount_rate
+
+
+class TrajectoryCosting:
+    def __init__(self, trajectory_log):
+        """ re-evaluates discounted costs and utilities of simulated patients from their recorded
+        trajectories, so that scenarios on costs, utilities and the discount rate do not need the
+        cohort to be simulated again
+        :param trajectory_log: (TrajectoryLog) transitions of the simulated patients
+        """
+
+        # sojourns of all patients and the position of each patient in the outcome arrays
+        patient_ids, self._starts, self._ends, self._states = trajectory_log.get_sojourns()
+        self.patientIds, self._patientIndices = np.unique(patient_ids, return_inverse=True)
+
+        # discounted time each patient spent in each health state, by discount rate
+        self._discountedStateTimes = {}
+
+    def get_discounted_state_times(self, discount_rate):
+        """
+        :param discount_rate: annual discount rate
+        :return: (np.array) discounted time each patient (rows) spent in each health state (columns)
+        """
+
+        if discount_rate not in self._discountedStateTimes:
+            discount_factors = get_discount_factors(discount_rate=discount_rate, starts=self._starts, ends=self._ends)
+            cells = self._patientIndices * len(HealthStates) + self._states
+            self._discountedStateTimes[discount_rate] = np.bincount(
+                cells, weights=discount_factors,
+                minlength=len(self.patientIds) * len(HealthStates)).reshape(-1, len(HealthStates))
+
+        return self._discountedStateTimes[discount_rate]
+
+    def evaluate(self, scenario):
+        """
+        :param scenario: (CostScenario) a cost scenario
+        :return: (tuple) (discounted cost, discounted utility) of each patient
+        """
+
+        state_times = self.get_discounted_state_times(discount_rate=scenario.discountRate)
+        return state_times @ scenario.annualCosts, state_times @ scenario.annualUtilities
+
+    def evaluate_scenarios(self, scenarios):
+        """
+        :param scenarios: (list of CostScenario) cost scenarios
+        :return: (tuple) (discounted costs, discounted utilities), each an array with a row per scenario
+                 and a column per patient
+        """
+
+        costs = np.empty((len(scenarios), len(self.patientIds)))
+        utilities = np.empty((len(scenarios), len(self.patientIds)))
+
+        # scenarios with the same discount rate are evaluated with a single matrix product
+        discount_rates = np.array([scenario.discountRate for scenario in scenarios])
+        for discount_rate in np.unique(discount_rates):
+            rows = np.flatnonzero(discount_rates == discount_rate)
+            state_times = self.get_discounted_state_times(discount_rate=discount_rate)
+            costs[rows] = (state_times @ np.array([scenarios[i].annualCosts for i in rows]).T).T
+            utilities[rows] = (state_times @ np.array([scenarios[i].annualUtilities for i in rows]).T).T
+
+        return costs, utilities
@@ -0,0 +1,147 @@
+import math
+
+import numpy as np
+
+
+def format_estimate_interval(estimate, interval, deci, form=None):
+    """
+    :param estimate: the estimate
+    :param interval: (list) [lower, upper] bounds of the interval
+    :param deci: number of decimal places
+    :param form: ',' to format as number, '%' to format as percentage, '$' to format as currency
+    :return: (string) text of the form 'estimate (lower, upper)', formatted as deampy formats it
+    """
+
+    if form in (None, ''):
+        number = '{:.{prec}f}'
+    elif form == ',':
+        number = '{:,.{prec}f}'
+    elif form == '$':
+        number = '${:,.{prec}f}'
+    elif form == '%':
+        number = '{:.{prec}f}%'
+        estimate, interval = 100 * estimate, [100 * interval[0], 100 * interval[1]]
+    else:
+        raise ValueError('Invalid value for form.')
+
+    return '{} ({}, {})'.format(number.format(estimate, prec=deci),
+                                number.format(interval[0], prec=deci),
+                                number.format(interval[1], prec=deci))
+
+
+class OnePassStat:
+    """ summary statistics updated as observations arrive (mean and variance by Welford's algorithm)
+    without storing the observations """
+
+    def __init__(self, name=None):
+        self.name = name
+        self._n = 0
+        self._total = 0
+        self._mean = 0
+        self._sumSqDev = 0      # sum of squared deviations from the mean
+        self._min = math.inf
+        self._max = -math.inf
+
+    def record(self, obs):
+        """ updates the statistics with a new observation
+        :param obs: (float) observation
+        """
+
+        self._n += 1
+        self._total += obs
+        delta = obs - self._mean
+        self._mean += delta / self._n
+        self._sumSqDev += delta * (obs - self._mean)
+        if obs > self._max:
+            self._max = obs
+        if obs < self._min:
+            self._min = obs
+
+    def record_batch(self, obs):
+        """ updates the statistics with a batch of observations
+        :param obs: (np.array) observations
+        """
+
+        if len(obs) > 0:
+            mean = np.mean(obs)
+            self._combine(n=len(obs), total=np.sum(obs), mean=mean, sum_sq_dev=np.sum((obs - mean) ** 2),
+                          minimum=np.min(obs), maximum=np.max(obs))
+
+    def merge(self, other):
+        """ updates the statistics with the observations summarized by another OnePassStat
+        :param other: (OnePassStat) statistics of another set of observations
+        """
+
+        if other._n > 0:
+            self._combine(n=other._n, total=other._total, mean=other._mean, sum_sq_dev=other._sumSqDev,
+                          minimum=other._min, maximum=other._max)
+
+    def _combine(self, n, total, mean, sum_sq_dev, minimum, maximum):
+        """ combines the statistics with those of another set of observations (Chan et al.) """
+
+        n_combined = self._n + n
+        delta = mean - self._mean
+        self._mean += delta * n / n_combined
+        self._sumSqDev += sum_sq_dev + delta ** 2 * self._n * n / n_combined
+        self._n = n_combined
+        self._total += total
+        self._min = min(self._min, minimum)
+        self._max = max(self._max, maximum)
+
+    def get_n(self):
+        return self._n
+
+    def get_total(self):
+        return self._total
+
+    def get_mean(self):
+        return self._mean
+
+    def get_stdev(self):
+        if self._n > 1:
+            return math.sqrt(self._sumSqDev / (self._n - 1))
+        else:
+            return math.nan
+
+    def get_min(self):
+        return self._min
+
+    def get_max(self):
+        return self._max
+
+    def get_t_CI(self, alpha):
+        """
+        :param alpha: significance level (between 0 and 1)
+        :return: (list) [lower, upper] t-based confidence interval of the mean
+        """
+
+        if self._n > 1:
+            from scipy.stats import t
+            half_length = t.ppf(1 - alpha / 2, self._n - 1) * self.get_stdev() / math.sqrt(self._n)
+            return [self._mean - half_length, self._mean + half_length]
+        else:
+            return [math.nan, math.nan]
+
+    def get_interval(self, interval_type='c', alpha=0.05):
+        """
+        :param interval_type: (string) 'c' for t-based confidence interval (the only interval
+                              available without the observations)
+        :param alpha: significance level
+        :return: (list) [lower, upper] bounds of the interval
+        """
+
+        if interval_type != 'c':
+            raise ValueError('Only t-based confidence intervals (c) can be calculated without the observations.')
+        return self.get_t_CI(alpha=alpha)
+
+    def get_formatted_mean_and_interval(self, interval_type='c', alpha=0.05, deci=0, form=None):
+        """
+        :param interval_type: (string) 'c' for t-based confidence interval
+        :param alpha: significance level
+        :param deci: number of decimal places
+        :param form: ',' to format as number, '%' to format as percentage, '$' to format as currency
+        :return: (string) mean and interval formatted as 'mean (lower, upper)'
+        """
+        return format_estimate_interval(estimate=self.get_mean(),
+                                        interval=self.get_interval(interval_type=interval_type, alpha=alpha),
+                                        deci=deci, form=form)
@@ -1,10 +1,16 @@
-import deampy.econ_eval as econ
-import deampy.plots.histogram as hist
-import deampy.plots.sample_paths as path
-import deampy.statistics as stats
+import csv
+import json
+import os
+
+import numpy as np
 
 import ct_hiv_model_econ_eval.input_data as data
 
+# deampy modules are imported by the functions that use them since importing deampy also imports
+# matplotlib, which processes that only simulate (or only report numbers) should not pay for
+
+STRATEGY_NAMES = ['Mono Therapy', 'Combination Therapy']
+
 
 def print_outcomes(sim_outcomes, therapy_name):
     """ prints the outcomes of a simulated cohort
@@ -55,55 +61,148 @@ def plot_survival_curves_and_histograms(sim_outcomes_mono, sim_outcomes_combo):
     :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
     """
 
-    # get survival curves of both treatments
-    survival_curves = [
-        sim_outcomes_mono.nLivingPatients,
-        sim_outcomes_combo.nLivingPatients
-    ]
+    # graph survival curves of both treatments
+    plot_survival_curves(survival_curve_mono=sim_outcomes_mono.nLivingPatients,
+                         survival_curve_combo=sim_outcomes_combo.nLivingPatients)
+
+    # graph histograms of survival times (from the bin counts cached on the cohort outcomes)
+    plot_survival_time_histograms(counts_mono=sim_outcomes_mono.survivalTimeCounts,
+                                  counts_combo=sim_outcomes_combo.survivalTimeCounts)
+
+
+def plot_survival_time_histograms(counts_mono, counts_combo, bin_width=data.HISTOGRAM_BIN_WIDTH):
+    """ draws the histograms of survival times from their bin counts (so that the cost of drawing
+    does not grow with the number of patients)
+    :param counts_mono: (np.array) number of survival times under mono therapy in each bin
+    :param counts_combo: (np.array) number of survival times under combination therapy in each bin
+    :param bin_width: width of the bins (the k-th bin is [k * bin_width, (k + 1) * bin_width))
+    """
+
+    import matplotlib.pyplot as plt
+    from deampy.plots.plot_support import output_figure
+    os.makedirs('figs', exist_ok=True)
+
+    fig, ax = plt.subplots()
+    for counts, legend, color in ((counts_mono, STRATEGY_NAMES[0], 'green'),
+                                  (counts_combo, STRATEGY_NAMES[1], 'blue')):
+        add_survival_time_histogram_to_ax(ax=ax, counts=counts, bin_width=bin_width, color=color, legend=legend)
+
+    ax.set_title('Histogram of patient survival time')
+    ax.set_xlabel('Survival time (year)')
+    ax.set_ylabel('Counts')
+    ax.legend(fontsize=8)
+
+    output_figure(plt, 'figs/survival_times.png')
+
+
+def plot_survival_time_histogram(counts, bin_width=data.HISTOGRAM_BIN_WIDTH, file_name=None):
+    """ draws the histogram of survival times of one cohort from its bin counts
+    :param counts: (np.array) number of survival times in each bin
+    :param bin_width: width of the bins (the k-th bin is [k * bin_width, (k + 1) * bin_width))
+    :param file_name: (string) file to save the figure as (if None, the figure is displayed)
+    """
+
+    import matplotlib.pyplot as plt
+    from deampy.plots.plot_support import output_figure
+
+    fig, ax = plt.subplots()
+    add_survival_time_histogram_to_ax(ax=ax, counts=counts, bin_width=bin_width)
+
+    ax.set_title('Histogram of Patient Survival Time')
+    ax.set_xlabel('Survival Time (Year)')
+    ax.set_ylabel('Count')
+
+    output_figure(plt, file_name)
+
+
+def add_survival_time_histogram_to_ax(ax, counts, bin_width=data.HISTOGRAM_BIN_WIDTH, color=None, legend=None):
+    """ adds the histogram of survival times drawn from their bin counts to an axis
+    :param ax: axis
+    :param counts: (np.array) number of survival times in each bin
+    :param bin_width: width of the bins (the k-th bin is [k * bin_width, (k + 1) * bin_width))
+    :param color: color of the bins
+    :param legend: (string) legend of the histogram
+    """
+
+    # each bin is drawn as one observation at its left edge weighted by the bin count
+    bin_edges = bin_width * np.arange(len(counts) + 1)
+    ax.hist(bin_edges[:-1], bins=bin_edges, weights=counts,
+            color=color, edgecolor='black', linewidth=0.5, alpha=0.5, label=legend)
+
+
+def plot_expected_survival_curves(occupancy_mono, occupancy_combo):
+    """ draws the expected survival curves calculated without simulation
+    :param occupancy_mono: (CohortOccupancy) evaluated state occupancy under mono therapy
+    :param occupancy_combo: (CohortOccupancy) evaluated state occupancy under combination therapy
+    """
+
+    plot_survival_curves(survival_curve_mono=occupancy_mono.nLivingPatients,
+                         survival_curve_combo=occupancy_combo.nLivingPatients,
+                         y_label='Expected number of alive patients')
+
+
+def plot_survival_curves(survival_curve_mono, survival_curve_combo, y_label='Number of alive patients'):
+    """ draws the survival curves of both treatments
+    :param survival_curve_mono: (sample path) number of alive patients over time under mono therapy
+    :param survival_curve_combo: (sample path) number of alive patients over time under combination therapy
+    :param y_label: (string) y-axis label
+    """
 
     # graph survival curve
+    import deampy.plots.sample_paths as path
+    os.makedirs('figs', exist_ok=True)
     path.plot_sample_paths(
-        sample_paths=survival_curves,
+        sample_paths=[survival_curve_mono, survival_curve_combo],
         title='Survival curve',
         x_label='Simulation time step (year)',
-        y_label='Number of alive patients',
+        y_label=y_label,
         legends=['Mono Therapy', 'Combination Therapy'],
         color_codes=['green', 'blue'],
         file_name='figs/survival_curves.png'
     )
 
-    # histograms of survival times
-    set_of_survival_times = [
-        sim_outcomes_mono.survivalTimes,
-        sim_outcomes_combo.survivalTimes
-    ]
-
-    # graph histograms
-    hist.plot_histograms(
-        data_sets=set_of_survival_times,
-        title='Histogram of patient survival time',
-        x_label='Survival time (year)',
-        y_label='Counts',
-        bin_width=1,
-        legends=['Mono Therapy', 'Combination Therapy'],
-        color_codes=['green', 'blue'],
-        transparency=0.5,
-        file_name='figs/survival_times.png'
-    )
+
+def get_survival_times_to_compare(sim_outcomes_mono, sim_outcomes_combo, if_paired=False):
+    """
+    :param sim_outcomes_mono: outcomes of a cohort simulated under mono therapy
+    :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
+    :param if_paired: set to True if both cohorts are the same patients simulated with common random numbers
+    :return: (tuple) survival times under mono and combination therapy of the patients who died
+             (under both therapies if paired)
+    """
+
+    if if_paired:
+        # survival times of patients who died under both therapies
+        if_died = ~np.isnan(sim_outcomes_mono.patientSurvivalTimes[:sim_outcomes_mono.nPatients]) \
+                  & ~np.isnan(sim_outcomes_combo.patientSurvivalTimes[:sim_outcomes_combo.nPatients])
+        return sim_outcomes_mono.patientSurvivalTimes[:sim_outcomes_mono.nPatients][if_died], \
+            sim_outcomes_combo.patientSurvivalTimes[:sim_outcomes_combo.nPatients][if_died]
+    else:
+        return sim_outcomes_mono.survivalTimes, sim_outcomes_combo.survivalTimes
 
 
-def print_comparative_outcomes(sim_outcomes_mono, sim_outcomes_combo):
+def print_comparative_outcomes(sim_outcomes_mono, sim_outcomes_combo, if_paired=False):
     """ prints average increase in survival time, discounted cost, and discounted utility
     under combination therapy compared to mono therapy
     :param sim_outcomes_mono: outcomes of a cohort simulated under mono therapy
     :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
+    :param if_paired: set to True if both cohorts are the same patients simulated with common random numbers
     """
 
+    import deampy.statistics as stats
+
+    if if_paired:
+        difference_stat = stats.DifferenceStatPaired
+    else:
+        difference_stat = stats.DifferenceStatIndp
+    survival_times_mono, survival_times_combo = get_survival_times_to_compare(
+        sim_outcomes_mono=sim_outcomes_mono, sim_outcomes_combo=sim_outcomes_combo, if_paired=if_paired)
+
     # increase in mean survival time under combination therapy with respect to mono therapy
-    increase_survival_time = stats.DifferenceStatIndp(
+    increase_survival_time = difference_stat(
         name='Increase in mean survival time',
-        x=sim_outcomes_combo.survivalTimes,
-        y_ref=sim_outcomes_mono.survivalTimes)
+        x=survival_times_combo,
+        y_ref=survival_times_mono)
 
     # estimate and CI
     estimate_CI = increase_survival_time.get_formatted_mean_and_interval(interval_type='c',
@@ -114,7 +213,7 @@ def print_comparative_outcomes(sim_outcomes_mono, sim_outcomes_combo):
           estimate_CI)
 
     # increase in mean discounted cost under combination therapy with respect to mono therapy
-    increase_discounted_cost = stats.DifferenceStatIndp(
+    increase_discounted_cost = difference_stat(
         name='Increase in mean discounted cost',
         x=sim_outcomes_combo.costs,
         y_ref=sim_outcomes_mono.costs)
@@ -129,7 +228,7 @@ def print_comparative_outcomes(sim_outcomes_mono, sim_outcomes_combo):
           estimate_CI)
 
     # increase in mean discounted utility under combination therapy with respect to mono therapy
-    increase_discounted_utility = stats.DifferenceStatIndp(
+    increase_discounted_utility = difference_stat(
         name='Increase in mean discounted utility',
         x=sim_outcomes_combo.utilities,
         y_ref=sim_outcomes_mono.utilities)
@@ -143,12 +242,47 @@ def print_comparative_outcomes(sim_outcomes_mono, sim_outcomes_combo):
           estimate_CI)
 
 
-def report_CEA_CBA(sim_outcomes_mono, sim_outcomes_combo):
+def print_bootstrap_CEA(sim_outcomes_mono, sim_outcomes_combo, if_paired=False,
+                        n_replicates=data.N_BOOTSTRAP_SAMPLES):
+    """ prints the increase in mean discounted cost and utility, and the ICER, of combination therapy
+    compared to mono therapy with percentile intervals from bootstrapping the patients of both cohorts
+    :param sim_outcomes_mono: outcomes of a cohort simulated under mono therapy
+    :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
+    :param if_paired: set to True if both cohorts are the same patients simulated with common random numbers
+    :param n_replicates: number of bootstrap replicates
+    """
+
+    import ct_hiv_model_econ_eval.bootstrap_classes as bootstrap
+
+    bootstrap_cea = bootstrap.get_bootstrap_cea(sim_outcomes_base=sim_outcomes_mono,
+                                                sim_outcomes_new=sim_outcomes_combo,
+                                                if_paired=if_paired,
+                                                n_replicates=n_replicates)
+
+    # estimates (from the simulated patients) and bootstrap intervals of the incremental outcomes
+    increase_cost = np.mean(sim_outcomes_combo.costs) - np.mean(sim_outcomes_mono.costs)
+    increase_utility = np.mean(sim_outcomes_combo.utilities) - np.mean(sim_outcomes_mono.utilities)
+    for name, estimate, interval, form in (
+            ('Increase in mean discounted cost', increase_cost,
+             bootstrap_cea.get_incremental_cost_interval(alpha=data.ALPHA), ',.2f'),
+            ('Increase in mean discounted utility', increase_utility,
+             bootstrap_cea.get_incremental_effect_interval(alpha=data.ALPHA), '.2f'),
+            ('ICER', increase_cost / increase_utility,
+             bootstrap_cea.get_icer_interval(alpha=data.ALPHA), ',.2f')):
+        print("{} and {:.{prec}%} bootstrap interval:".format(name, 1 - data.ALPHA, prec=0),
+              "{:{form}} ({:{form}}, {:{form}})".format(estimate, interval[0], interval[1], form=form))
+
+
+def report_CEA_CBA(sim_outcomes_mono, sim_outcomes_combo, if_paired=False):
     """ performs cost-effectiveness and cost-benefit analyses
     :param sim_outcomes_mono: outcomes of a cohort simulated under mono therapy
     :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
+    :param if_paired: set to True if both cohorts are the same patients simulated with common random numbers
     """
 
+    import deampy.econ_eval as econ
+    os.makedirs('figs', exist_ok=True)
+
     # define two strategies
     mono_therapy_strategy = econ.Strategy(
         name='Mono Therapy',
@@ -167,8 +301,8 @@ def report_CEA_CBA(sim_outcomes_mono, sim_outcomes_combo):
     # (the first strategy in the list of strategies is assumed to be the 'Base' strategy)
     CEA = econ.CEA(
         strategies=[mono_therapy_strategy, combo_therapy_strategy],
-        wtp_range=[0, 50000],
-        if_paired=False
+        wtp_range=data.WTP_RANGE,
+        if_paired=if_paired
     )
 
     # plot cost-effectiveness figure
@@ -201,3 +335,352 @@ def report_CEA_CBA(sim_outcomes_mono, sim_outcomes_combo):
         figure_size=(6, 5),
         file_name='figs/nmb.png'
     )
+
+
+def report_PSA(psa):
+    """ performs cost-effectiveness analysis over the parameter sets of a probabilistic sensitivity analysis
+    :param psa: (PSA) a completed probabilistic sensitivity analysis
+    """
+
+    import deampy.econ_eval as econ
+    os.makedirs('figs', exist_ok=True)
+
+    # define two strategies (each observation is the mean outcome of a parameter set)
+    mono_therapy_strategy = econ.Strategy(
+        name='Mono Therapy',
+        cost_obs=psa.meanCosts[:, 0],
+        effect_obs=psa.meanEffects[:, 0],
+        color='green'
+    )
+    combo_therapy_strategy = econ.Strategy(
+        name='Combination Therapy',
+        cost_obs=psa.meanCosts[:, 1],
+        effect_obs=psa.meanEffects[:, 1],
+        color='blue'
+    )
+
+    # do CEA (both therapies are simulated with the same parameter set in each draw)
+    CEA = econ.CEA(
+        strategies=[mono_therapy_strategy, combo_therapy_strategy],
+        wtp_range=data.WTP_RANGE,
+        if_paired=True
+    )
+
+    # plot cost-effectiveness figure
+    CEA.plot_ce_plane(
+        title='Cost-Effectiveness Analysis (PSA)',
+        x_label='Additional QALYs',
+        y_label='Additional Cost',
+        interval_type='p',  # to show percentile intervals for cost and effect of each strategy
+        file_name='figs/psa_cea.png'
+    )
+
+    # report the CE table
+    CEA.export_ce_table(
+        interval_type='p',
+        alpha=data.ALPHA,
+        cost_digits=0,
+        effect_digits=2,
+        icer_digits=2,
+        file_name='../PSACETable.csv')
+
+
+def report_CEAC_EVPI(mean_costs, mean_effects, file_name=None):
+    """ calculates the cost-effectiveness acceptability curves and the expected value of perfect
+    information of both therapies over a dense grid of willingness-to-pay values
+    :param mean_costs: (np.array) mean cost of mono and combination therapy (columns) in each PSA draw
+                       or bootstrap replicate (rows)
+    :param mean_effects: (np.array) mean utility of mono and combination therapy (columns) in each PSA draw
+                         or bootstrap replicate (rows)
+    :param file_name: (string) csv file to export the results to (if None, the results are not exported)
+    :return: (AcceptabilityAnalysis) the calculated curves
+    """
+
+    import ct_hiv_model_econ_eval.acceptability_classes as acceptability
+
+    analysis = acceptability.AcceptabilityAnalysis(mean_costs=mean_costs,
+                                                   mean_effects=mean_effects,
+                                                   strategy_names=STRATEGY_NAMES)
+    if file_name is not None:
+        analysis.export_table(file_name=file_name)
+
+    return analysis
+
+
+# numeric reports: the numbers behind the printed outcomes, tables and figures as structured data,
+# calculated with numpy and scipy only (without deampy or matplotlib)
+
+
+def get_mean_and_interval(obs, alpha=data.ALPHA):
+    """
+    :param obs: (np.array) observations
+    :param alpha: significance level
+    :return: (dict) mean and t-based confidence interval of the mean of the observations
+    """
+
+    from scipy.stats import t
+
+    n = len(obs)
+    mean = np.mean(obs) if n > 0 else np.nan
+    if n > 1:
+        half_length = t.ppf(1 - alpha / 2, n - 1) * np.std(obs, ddof=1) / np.sqrt(n)
+    else:
+        half_length = np.nan
+    return {'mean': mean, 'interval': [mean - half_length, mean + half_length]}
+
+
+def get_stat_mean_and_interval(stat, alpha=data.ALPHA):
+    """
+    :param stat: summary statistics of observations (e.g. the OnePassStat of streaming outcomes)
+    :param alpha: significance level
+    :return: (dict) mean and t-based confidence interval of the mean of the observations
+    """
+    return {'mean': stat.get_mean(), 'interval': list(stat.get_t_CI(alpha=alpha))}
+
+
+def get_difference_and_interval(x, y_ref, if_paired=False, alpha=data.ALPHA):
+    """
+    :param x: (np.array) observations
+    :param y_ref: (np.array) reference observations
+    :param if_paired: set to True if the i-th observations of x and y_ref are paired
+    :param alpha: significance level
+    :return: (dict) difference of the means of x and y_ref and its t-based confidence interval
+             (Welch's interval if not paired)
+    """
+
+    if if_paired:
+        return get_mean_and_interval(obs=np.asarray(x) - np.asarray(y_ref), alpha=alpha)
+
+    return get_welch_difference_and_interval(mean_x=np.mean(x), var_x=np.var(x, ddof=1), n_x=len(x),
+                                             mean_y_ref=np.mean(y_ref), var_y_ref=np.var(y_ref, ddof=1),
+                                             n_y_ref=len(y_ref), alpha=alpha)
+
+
+def get_stat_difference_and_interval(stat_x, stat_y_ref, if_paired=False, alpha=data.ALPHA):
+    """
+    :param stat_x: summary statistics of observations (e.g. the OnePassStat of streaming outcomes)
+    :param stat_y_ref: summary statistics of reference observations
+    :param if_paired: set to True if the observations are paired
+    :param alpha: significance level
+    :return: (dict) difference of the means and its Welch's t-based confidence interval
+             (None if paired, since the interval of a paired difference needs each pair of observations)
+    """
+
+    if if_paired:
+        return {'mean': stat_x.get_mean() - stat_y_ref.get_mean(), 'interval': None}
+
+    return get_welch_difference_and_interval(mean_x=stat_x.get_mean(), var_x=stat_x.get_stdev() ** 2,
+                                             n_x=stat_x.get_n(), mean_y_ref=stat_y_ref.get_mean(),
+                                             var_y_ref=stat_y_ref.get_stdev() ** 2, n_y_ref=stat_y_ref.get_n(),
+                                             alpha=alpha)
+
+
+def get_welch_difference_and_interval(mean_x, var_x, n_x, mean_y_ref, var_y_ref, n_y_ref, alpha=data.ALPHA):
+    """
+    :param mean_x: mean of the observations
+    :param var_x: sample variance of the observations
+    :param n_x: number of observations
+    :param mean_y_ref: mean of the independent reference observations
+    :param var_y_ref: sample variance of the reference observations
+    :param n_y_ref: number of reference observations
+    :param alpha: significance level
+    :return: (dict) difference of the means and its Welch's t-based confidence interval
+    """
+
+    from scipy.stats import t
+
+    # variances of the means and Welch-Satterthwaite degrees of freedom
+    var_x = var_x / n_x
+    var_y = var_y_ref / n_y_ref
+    df = (var_x + var_y) ** 2 / (var_x ** 2 / (n_x - 1) + var_y ** 2 / (n_y_ref - 1))
+
+    difference = mean_x - mean_y_ref
+    half_length = t.ppf(1 - alpha / 2, df) * np.sqrt(var_x + var_y)
+    return {'mean': difference, 'interval': [difference - half_length, difference + half_length]}
+
+
+def get_outcomes(sim_outcomes, alpha=data.ALPHA):
+    """
+    :param sim_outcomes: outcomes of a simulated cohort
+    :param alpha: significance level
+    :return: (dict) mean and confidence interval of the outcomes printed by print_outcomes
+    """
+
+    # streaming outcomes only keep summary statistics
+    if sim_outcomes.ifStreaming:
+        return {'survival time': get_stat_mean_and_interval(stat=sim_outcomes.statSurvivalTime, alpha=alpha),
+                'time to AIDS': get_stat_mean_and_interval(stat=sim_outcomes.statTimeToAIDS, alpha=alpha),
+                'discounted cost': get_stat_mean_and_interval(stat=sim_outcomes.statCost, alpha=alpha),
+                'discounted utility': get_stat_mean_and_interval(stat=sim_outcomes.statUtility, alpha=alpha)}
+
+    return {'survival time': get_mean_and_interval(obs=sim_outcomes.survivalTimes, alpha=alpha),
+            'time to AIDS': get_mean_and_interval(obs=sim_outcomes.timesToAIDS, alpha=alpha),
+            'discounted cost': get_mean_and_interval(obs=sim_outcomes.costs, alpha=alpha),
+            'discounted utility': get_mean_and_interval(obs=sim_outcomes.utilities, alpha=alpha)}
+
+
+def get_comparative_outcomes(sim_outcomes_mono, sim_outcomes_combo, if_paired=False, alpha=data.ALPHA):
+    """
+    :param sim_outcomes_mono: outcomes of a cohort simulated under mono therapy
+    :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
+    :param if_paired: set to True if both cohorts are the same patients simulated with common random numbers
+    :param alpha: significance level
+    :return: (dict) increase in the outcomes under combination therapy compared to mono therapy,
+             with confidence intervals (the numbers printed by print_comparative_outcomes); for streaming
+             outcomes, see get_stat_difference_and_interval, and the increase in mean survival time is None if
+             paired since it is compared over the patients who died under both therapies
+    """
+
+    # streaming outcomes only keep summary statistics
+    if sim_outcomes_mono.ifStreaming or sim_outcomes_combo.ifStreaming:
+        return {'increase in mean survival time': None if if_paired else get_stat_difference_and_interval(
+                    stat_x=sim_outcomes_combo.statSurvivalTime, stat_y_ref=sim_outcomes_mono.statSurvivalTime,
+                    alpha=alpha),
+                'increase in mean discounted cost': get_stat_difference_and_interval(
+                    stat_x=sim_outcomes_combo.statCost, stat_y_ref=sim_outcomes_mono.statCost, if_paired=if_paired,
+                    alpha=alpha),
+                'increase in mean discounted utility': get_stat_difference_and_interval(
+                    stat_x=sim_outcomes_combo.statUtility, stat_y_ref=sim_outcomes_mono.statUtility,
+                    if_paired=if_paired, alpha=alpha)}
+
+    survival_times_mono, survival_times_combo = get_survival_times_to_compare(
+        sim_outcomes_mono=sim_outcomes_mono, sim_outcomes_combo=sim_outcomes_combo, if_paired=if_paired)
+
+    return {'increase in mean survival time': get_difference_and_interval(
+                x=survival_times_combo, y_ref=survival_times_mono, if_paired=if_paired, alpha=alpha),
+            'increase in mean discounted cost': get_difference_and_interval(
+                x=sim_outcomes_combo.costs, y_ref=sim_outcomes_mono.costs, if_paired=if_paired, alpha=alpha),
+            'increase in mean discounted utility': get_difference_and_interval(
+                x=sim_outcomes_combo.utilities, y_ref=sim_outcomes_mono.utilities, if_paired=if_paired, alpha=alpha)}
+
+
+def get_CE_table(sim_outcomes_mono, sim_outcomes_combo, if_paired=False, alpha=data.ALPHA):
+    """
+    :param sim_outcomes_mono: outcomes of a cohort simulated under mono therapy
+    :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
+    :param if_paired: set to True if both cohorts are the same patients simulated with common random numbers
+    :param alpha: significance level
+    :return: (list) a row (dict) per therapy with its cost and effect and, for combination therapy,
+             the incremental cost, incremental effect and ICER relative to mono therapy
+             (the interval of the ICER is a bootstrap percentile interval); for streaming outcomes, the
+             interval of the ICER is None since the bootstrap resamples the outcome of each patient
+             (see get_stat_difference_and_interval for the incremental outcomes)
+    """
+
+    import ct_hiv_model_econ_eval.bootstrap_classes as bootstrap
+
+    rows = []
+    for name, sim_outcomes in zip(STRATEGY_NAMES, (sim_outcomes_mono, sim_outcomes_combo)):
+        outcomes = get_outcomes(sim_outcomes=sim_outcomes, alpha=alpha)
+        rows.append({'strategy': name, 'cost': outcomes['discounted cost'], 'effect': outcomes['discounted utility']})
+
+    if sim_outcomes_mono.ifStreaming or sim_outcomes_combo.ifStreaming:
+        # streaming outcomes only keep summary statistics, so the ICER cannot be bootstrapped
+        incremental_cost = get_stat_difference_and_interval(
+            stat_x=sim_outcomes_combo.statCost, stat_y_ref=sim_outcomes_mono.statCost, if_paired=if_paired,
+            alpha=alpha)
+        incremental_effect = get_stat_difference_and_interval(
+            stat_x=sim_outcomes_combo.statUtility, stat_y_ref=sim_outcomes_mono.statUtility, if_paired=if_paired,
+            alpha=alpha)
+        icer_interval = None
+    else:
+        incremental_cost = get_difference_and_interval(
+            x=sim_outcomes_combo.costs, y_ref=sim_outcomes_mono.costs, if_paired=if_paired, alpha=alpha)
+        incremental_effect = get_difference_and_interval(
+            x=sim_outcomes_combo.utilities, y_ref=sim_outcomes_mono.utilities, if_paired=if_paired, alpha=alpha)
+        bootstrap_cea = bootstrap.get_bootstrap_cea(sim_outcomes_base=sim_outcomes_mono,
+                                                    sim_outcomes_new=sim_outcomes_combo,
+                                                    if_paired=if_paired)
+        icer_interval = list(bootstrap_cea.get_icer_interval(alpha=alpha))
+
+    rows[1].update({'incremental cost': incremental_cost,
+                    'incremental effect': incremental_effect,
+                    'ICER': {'mean': incremental_cost['mean'] / incremental_effect['mean'],
+                             'interval': icer_interval}})
+    return rows
+
+
+def get_survival_curve_points(sim_outcomes):
+    """
+    :param sim_outcomes: outcomes of a simulated cohort
+    :return: (dict) the survival curve as a step function downsampled to no more than
+             SURVIVAL_CURVE_MAX_POINTS points: the times of the points, the number of alive patients
+             from each of them on, and the minimum number of alive patients until the next one
+             (None for streaming outcomes, which do not keep the survival times)
+    """
+
+    if sim_outcomes.ifStreaming:
+        return None
+
+    times, n_alive, min_n_alive = sim_outcomes.survivalCurve.get_downsampled_points(
+        max_points=data.SURVIVAL_CURVE_MAX_POINTS)
+    return {'times': times, 'n_alive': n_alive, 'min_n_alive': min_n_alive}
+
+
+def get_survival_time_histogram(sim_outcomes):
+    """
+    :param sim_outcomes: outcomes of a simulated cohort
+    :return: (dict) edges of the bins (of width HISTOGRAM_BIN_WIDTH, starting at 0) and the number of
+             survival times in each bin
+    """
+
+    counts = sim_outcomes.survivalTimeCounts
+    return {'bin_edges': data.HISTOGRAM_BIN_WIDTH * np.arange(len(counts) + 1), 'counts': counts}
+
+
+def export_survival_time_histograms(sim_outcomes_mono, sim_outcomes_combo, file_name):
+    """ writes the bin counts of the survival time histograms of both therapies as csv
+    :param sim_outcomes_mono: outcomes of a cohort simulated under mono therapy
+    :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
+    :param file_name: (string) csv file to write
+    """
+
+    # bin counts of both therapies over the same bins
+    n_bins = max(len(sim_outcomes_mono.survivalTimeCounts), len(sim_outcomes_combo.survivalTimeCounts))
+    counts = np.zeros((n_bins, 2), dtype=int)
+    counts[:len(sim_outcomes_mono.survivalTimeCounts), 0] = sim_outcomes_mono.survivalTimeCounts
+    counts[:len(sim_outcomes_combo.survivalTimeCounts), 1] = sim_outcomes_combo.survivalTimeCounts
+
+    bin_starts = data.HISTOGRAM_BIN_WIDTH * np.arange(n_bins)
+    with open(file_name, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['Bin Start', 'Bin End'] + STRATEGY_NAMES)
+        for bin_start, bin_counts in zip(bin_starts, counts):
+            writer.writerow([bin_start, bin_start + data.HISTOGRAM_BIN_WIDTH] + list(bin_counts))
+
+
+def get_numeric_report(sim_outcomes_mono, sim_outcomes_combo, if_paired=False):
+    """ the numbers reported for both therapies (without rendering figures, so that matplotlib is not imported)
+    :param sim_outcomes_mono: outcomes of a cohort simulated under mono therapy
+    :param sim_outcomes_combo: outcomes of a cohort simulated under combination therapy
+    :param if_paired: set to True if both cohorts are the same patients simulated with common random numbers
+    :return: (dict) outcomes of each therapy, comparative outcomes, CE table, and the points of the
+             survival curves and bin counts of the survival time histograms of each therapy
+             (numbers that need the outcome of each patient are None for streaming outcomes)
+    """
+
+    both_outcomes = (sim_outcomes_mono, sim_outcomes_combo)
+
+    return {'outcomes': {name: get_outcomes(sim_outcomes=sim_outcomes)
+                         for name, sim_outcomes in zip(STRATEGY_NAMES, both_outcomes)},
+            'comparative outcomes': get_comparative_outcomes(sim_outcomes_mono=sim_outcomes_mono,
+                                                             sim_outcomes_combo=sim_outcomes_combo,
+                                                             if_paired=if_paired),
+            'CE table': get_CE_table(sim_outcomes_mono=sim_outcomes_mono,
+                                     sim_outcomes_combo=sim_outcomes_combo,
+                                     if_paired=if_paired),
+            'survival curves': {name: get_survival_curve_points(sim_outcomes=sim_outcomes)
+                                for name, sim_outcomes in zip(STRATEGY_NAMES, both_outcomes)},
+            'survival time histograms': {name: get_survival_time_histogram(sim_outcomes=sim_outcomes)
+                                         for name, sim_outcomes in zip(STRATEGY_NAMES, both_outcomes)}}
+
+
+def export_numeric_report(report, file_name):
+    """ writes a numeric report as json
+    :param report: (dict) report returned by get_numeric_report
+    :param file_name: (string) json file to write
+    """
+
+    with open(file_name, 'w') as file:
+        # numpy arrays and numbers are written as lists and numbers
+        json.dump(report, file, indent=1, default=lambda obj: obj.tolist())
@@ -0,0 +1,81 @@
+import numpy as np
+
+import ct_hiv_model_econ_eval.input_data as data
+
+
+class SurvivalCurve:
+    def __init__(self, survival_times, initial_size):
+        """ number of alive patients over time (a step function that drops at each death),
+        built by sorting the survival times once
+        :param survival_times: (np.array) survival times of the patients who died
+        :param initial_size: number of patients alive at time 0
+        """
+
+        self.deathTimes = np.sort(survival_times)
+        self.initialSize = initial_size
+
+    def get_n_alive(self, times):
+        """
+        :param times: (np.array) time points
+        :return: (np.array) number of patients alive at each time point (patients who die at a time
+                 point are not alive at it)
+        """
+        return self.initialSize - np.searchsorted(self.deathTimes, times, side='right')
+
+    def get_points(self, times):
+        """ the survival curve at a set of time points, with bounds on its values in between
+        :param times: (np.array) increasing time points starting at 0
+        :return: (tuple) the time points, the number of patients alive at each of them, and the minimum
+                 number of patients alive from each time point until the next one (after the last time
+                 point, until the end of the simulation); since the curve only decreases, it lies between
+                 the last two from each time point to the next
+        """
+
+        times = np.asarray(times, dtype=float)
+        n_alive = self.get_n_alive(times)
+
+        # number alive just before the next time point
+        min_n_alive = np.empty(len(times), dtype=n_alive.dtype)
+        min_n_alive[:-1] = self.initialSize - np.searchsorted(self.deathTimes, times[1:], side='left')
+        min_n_alive[-1] = self.initialSize - len(self.deathTimes)
+
+        return times, n_alive, min_n_alive
+
+    def get_exact_points(self):
+        """ :return: (tuple) time 0 and the times at which patients die, the number of patients
+                     alive from each of these times on, and the same number as its minimum """
+        return self.get_points(times=np.unique(np.concatenate(([0], self.deathTimes))))
+
+    def get_grid_points(self, grid_step, sim_length=None):
+        """
+        :param grid_step: distance between the time points of the grid
+        :param sim_length: time of the last grid point (if None, the first grid point after the last death)
+        :return: (tuple) the survival curve on a grid of time points with bounds in between (see get_points)
+        """
+
+        if sim_length is None:
+            sim_length = self.deathTimes[-1] + grid_step if len(self.deathTimes) > 0 else 0
+        return self.get_points(times=np.arange(0, sim_length + grid_step / 2, grid_step))
+
+    def get_downsampled_points(self, max_points=data.SURVIVAL_CURVE_MAX_POINTS):
+        """
+        :param max_points: maximum number of time points
+        :return: (tuple) the survival curve at no more than max_points of the times at which it changes,
+                 kept evenly spaced in the number of deaths and including the first and the last, with
+                 bounds in between (see get_points); exact if the curve changes no more than max_points times
+        """
+
+        if max_points < 2:
+            raise ValueError('A downsampled survival curve needs at least 2 points.')
+
+        change_times = np.unique(np.concatenate(([0], self.deathTimes)))
+
+        if len(change_times) > max_points:
+            # keep every k-th change so that, with the last change, no more than max_points are kept
+            k = -(-(len(change_times) - 1) // (max_points - 1))
+            kept = np.arange(0, len(change_times), k)
+            if kept[-1] != len(change_times) - 1:
+                kept = np.append(kept, len(change_times) - 1)
+            change_times = change_times[kept]
+
+        return self.get_points(times=change_times)
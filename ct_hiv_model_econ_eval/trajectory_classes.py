@@ -0,0 +1,155 @@
+import numpy as np
+
+
+class TrajectoryLog:
+    def __init__(self, capacity=0):
+        """ records the health state transitions of simulated patients in columns;
+        each record (patient id, time, from state, to state) closes a sojourn in 'from state' that started
+        at the patient's previous record (or at time 0), and patients who are still alive at the end of
+        the simulation have a last record with 'from state' equal to 'to state'
+        :param capacity: number of records to preallocate (the columns grow if more are recorded)
+        """
+
+        self.nRecords = 0                                       # number of records so far
+        self.patientIds = np.zeros(capacity, dtype=np.int64)    # id of the patient
+        self.times = np.zeros(capacity)                         # time of the transition
+        self.fromStates = np.zeros(capacity, dtype=np.int8)     # health state before the transition
+        self.toStates = np.zeros(capacity, dtype=np.int8)       # health state after the transition
+
+    def record(self, patient_id, time, from_state, to_state):
+        """ records the transition of a patient
+        :param patient_id: id of the patient
+        :param time: time of the transition
+        :param from_state: (HealthStates) health state before the transition
+        :param to_state: (HealthStates) health state after the transition
+        """
+
+        i = self._reserve(n_records=1)
+        self.patientIds[i] = patient_id
+        self.times[i] = time
+        self.fromStates[i] = from_state.value
+        self.toStates[i] = to_state.value
+
+    def record_batch(self, patient_ids, times, from_states, to_states):
+        """ records the transitions of many patients
+        :param patient_ids: (np.array) ids of the patients
+        :param times: (np.array) times of the transitions
+        :param from_states: (np.array) indices of the health states before the transitions
+        :param to_states: (np.array) indices of the health states after the transitions
+        """
+
+        i = self._reserve(n_records=len(patient_ids))
+        records = slice(i, i + len(patient_ids))
+        self.patientIds[records] = patient_ids
+        self.times[records] = times
+        self.fromStates[records] = from_states
+        self.toStates[records] = to_states
+
+    def merge(self, other):
+        """ appends the records of another trajectory log
+        :param other: (TrajectoryLog) records of another set of simulated patients
+        """
+
+        self.record_batch(patient_ids=other.patientIds[:other.nRecords],
+                          times=other.times[:other.nRecords],
+                          from_states=other.fromStates[:other.nRecords],
+                          to_states=other.toStates[:other.nRecords])
+
+    def save(self, file_name):
+        """ saves the records in a compressed binary file
+        :param file_name: (string) file name (e.g. 'trajectories.npz')
+        """
+
+        np.savez_compressed(file_name,
+                            patient_ids=self.patientIds[:self.nRecords],
+                            times=self.times[:self.nRecords],
+                            from_states=self.fromStates[:self.nRecords],
+                            to_states=self.toStates[:self.nRecords])
+
+    def get_sojourns(self):
+        """
+        :return: (tuple) (patient ids, start times, end times, health state indices) of all sojourns,
+                 sorted by patient id and time
+        """
+
+        # sort records by patient id and then by time
+        order = np.lexsort((self.times[:self.nRecords], self.patientIds[:self.nRecords]))
+        patient_ids = self.patientIds[order]
+        ends = self.times[order]
+
+        # each sojourn starts at the end of the previous sojourn of the same patient (or at time 0)
+        starts = np.zeros(len(ends))
+        starts[1:] = ends[:-1]
+        starts[np.unique(patient_ids, return_index=True)[1]] = 0
+
+        return patient_ids, starts, ends, self.fromStates[order]
+
+    def get_n_transitions(self):
+        """ :return: (tuple) (patient ids, number of transitions of each patient) """
+
+        if_transition = self.fromStates[:self.nRecords] != self.toStates[:self.nRecords]
+        ids, inverse = np.unique(self.patientIds[:self.nRecords], return_inverse=True)
+        return ids, np.bincount(inverse, weights=if_transition, minlength=len(ids)).astype(int)
+
+    def get_time_in_state(self, state):
+        """
+        :param state: (HealthStates) a health state
+        :return: (tuple) (patient ids, time each patient spent in the health state)
+        """
+
+        patient_ids, starts, ends, states = self.get_sojourns()
+        ids, inverse = np.unique(patient_ids, return_inverse=True)
+        durations = np.where(states == state.value, ends - starts, 0)
+        return ids, np.bincount(inverse, weights=durations, minlength=len(ids))
+
+    def get_states_at(self, time):
+        """
+        :param time: simulation time
+        :return: (tuple) (patient ids, index of the health state of each patient at the specified time)
+        """
+
+        order = np.lexsort((self.times[:self.nRecords], self.patientIds[:self.nRecords]))
+        patient_ids = self.patientIds[order]
+        ids, first_records, inverse = np.unique(patient_ids, return_index=True, return_inverse=True)
+
+        # number of transitions of each patient that occurred by the specified time
+        n_occurred = np.bincount(inverse, weights=self.times[order] <= time, minlength=len(ids)).astype(int)
+
+        # the state after the last transition that occurred, or the state of the first sojourn
+        last_records = first_records + np.maximum(n_occurred - 1, 0)
+        states = np.where(n_occurred > 0, self.toStates[order][last_records], self.fromStates[order][first_records])
+        return ids, states
+
+    def _reserve(self, n_records):
+        """ makes room for more records (doubling the columns if they are full)
+        :param n_records: number of records to store
+        :return: index where the first of these records should be stored
+        """
+
+        i = self.nRecords
+        self.nRecords += n_records
+
+        capacity = len(self.times)
+        if self.nRecords > capacity:
+            extra = max(self.nRecords, 2 * capacity) - capacity
+            self.patientIds = np.append(self.patientIds, np.zeros(extra, dtype=np.int64))
+            self.times = np.append(self.times, np.zeros(extra))
+            self.fromStates = np.append(self.fromStates, np.zeros(extra, dtype=np.int8))
+            self.toStates = np.append(self.toStates, np.zeros(extra, dtype=np.int8))
+
+        return i
+
+
+def load_trajectory_log(file_name):
+    """
+    :param file_name: (string) file saved by TrajectoryLog.save
+    :return: (TrajectoryLog) the saved records
+    """
+
+    with np.load(file_name) as file:
+        log = TrajectoryLog()
+        log.record_batch(patient_ids=file['patient_ids'],
+                         times=file['times'],
+                         from_states=file['from_states'],
+                         to_states=file['to_states'])
+    return log